@@ -0,0 +1,174 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from clock import SYSTEM_CLOCK
+from metrics import metrics
+from random import random
+
+
+SHED_POLICIES = ('fcfs', 'reservoir')
+
+
+class InFlightLimit:
+    """
+    Cap on the join resolutions running at once, which can be shared by the giveaways of several
+    streams. It never waits: a join finding it full is shed at once, so a flood cannot pile up
+    lookups and make every join slow.
+
+    :param maximum: Highest number of resolutions in flight, `None` for no cap.
+    :type maximum: int | None
+    """
+
+    def __init__(self, maximum):
+        self.maximum = maximum
+        self.in_flight = 0
+
+    def acquire(self):
+        if self.maximum is not None and self.in_flight >= self.maximum: return False
+
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+
+class AdmissionControl:
+    """
+    Decides, before any network work, whether a join command is worth resolving. A join is shed
+    (with its reason counted in `shed` and in `giveaway_joins_shed_total`) when:
+
+    - `cooldown`: a join of the same user was admitted less than `cooldown` seconds ago;
+    - `in_flight`: `limit` resolutions are already running;
+    - `round_full` or `reservoir`: the round already holds `round_cap` participants, counting
+      those being resolved.
+
+    Which joins a full round keeps depends on `policy`. With `fcfs` the first `round_cap` joins
+    get in and the later ones are shed. With `reservoir` every user joining the round gets an
+    equal chance: the n-th one is resolved with probability `round_cap / n` and, once admitted,
+    takes the place of a random participant, so a late viewer is as likely to end up in the draw
+    as an early one. A user gets a single draw per round, so sending `join` again is shed rather
+    than drawn again, and joins shed for `in_flight` are not counted as arrivals.
+
+    :param round_cap: Most participants in a round, `None` for no cap.
+    :type round_cap: int | None
+    :param cooldown: Minimum time between two joins of a user, in seconds.
+    :type cooldown: float
+    :param policy: One of `SHED_POLICIES`.
+    :type policy: str
+    :param limit: The cap on resolutions in flight, possibly shared with other giveaways.
+    :type limit: InFlightLimit | None
+    :param labels: The labels of the shed counter, e.g. the stream.
+    :type labels: dict | None
+    :param clock: The clock the cooldowns are measured with.
+    :type clock: SystemClock
+    """
+
+    def __init__(self, round_cap=None, cooldown=0.0, policy='fcfs', limit=None, labels=None, clock=SYSTEM_CLOCK):
+        if policy not in SHED_POLICIES:
+            raise ValueError(f'Unknown shed policy {policy!r}, expected one of {SHED_POLICIES}')
+
+        self.round_cap = round_cap
+        self.cooldown = cooldown
+        self.policy = policy
+        self.limit = limit if limit is not None else InFlightLimit(None)
+        self.labels = labels or {}
+        self.clock = clock
+
+        self.arrivals = 0
+        self.shed = {}
+        self.round_shed = {}
+
+        self._last_join = {}
+        self._arrived = set()
+
+    def new_round(self):
+        """
+        Starts counting the joins of a new round, and forgets the cooldowns that have expired.
+
+        :return: The joins shed during the previous round, by reason.
+        :rtype: dict[str, int]
+        """
+        shed, self.round_shed = self.round_shed, {}
+        self.arrivals = 0
+        self._arrived.clear()
+
+        if self.cooldown:
+            expired = self.clock.monotonic() - self.cooldown
+            self._last_join = {username: last for username, last in self._last_join.items() if last > expired}
+
+        return shed
+
+    def admit(self, username, participants, pending):
+        """
+        Decides whether a join is resolved. On admission a slot of `limit` is taken, to be given
+        back with `release()` once the resolution is over.
+
+        :param username: The username of the join.
+        :type username: str
+        :param participants: The participants of the current round.
+        :type participants: ParticipantRegistry
+        :param pending: Number of joins of the current round being resolved.
+        :type pending: int
+
+        :return: `None` if the join is admitted, otherwise the reason it is shed.
+        :rtype: str | None
+        """
+        now = self.clock.monotonic()
+        if self.cooldown and now - self._last_join.get(username, float('-inf')) < self.cooldown:
+            return self._shed('cooldown')
+
+        if not self.limit.acquire(): return self._shed('in_flight')
+
+        if self.round_cap is not None and (reason := self._capped(username, participants, pending)):
+            self.limit.release()
+            return self._shed(reason)
+
+        # Only admitted joins start a cooldown: a join shed for load can be sent again right away.
+        if self.cooldown: self._last_join[username] = now
+
+        return None
+
+    def release(self):
+        self.limit.release()
+
+    def _capped(self, username, participants, pending):
+        if self.policy == 'fcfs':
+            return 'round_full' if len(participants) + pending >= self.round_cap else None
+
+        if username in self._arrived: return 'reservoir'
+
+        self._arrived.add(username)
+        self.arrivals += 1
+
+        return 'reservoir' if self.arrivals > self.round_cap and random() * self.arrivals >= self.round_cap else None
+
+    def make_room(self, participants):
+        """
+        Evicts a random participant if the round is full, to let a join admitted by the
+        `reservoir` policy in.
+
+        :param participants: The participants of the current round.
+        :type participants: ParticipantRegistry
+
+        :return: The evicted participant, if any.
+        :rtype: Participant | None
+        """
+        if self.policy != 'reservoir' or self.round_cap is None or len(participants) < self.round_cap: return None
+        if (evicted := participants.draw()) is None: return None
+
+        participants.remove(evicted.username)
+        self._shed('reservoir')
+
+        return evicted
+
+    def _shed(self, reason):
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        self.round_shed[reason] = self.round_shed.get(reason, 0) + 1
+        metrics.inc('giveaway_joins_shed_total', reason=reason, **self.labels)
+
+        return reason
@@ -0,0 +1,244 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from mock_server import MockRoblox, add_arguments
+from purchase import PurchaseClient
+from roblox import RobloxClient
+from time import perf_counter
+from random import Random
+
+import argparse
+import asyncio
+import json
+
+
+def percentile(values, q):
+    """
+    Returns the `q` quantile of the values using the nearest-rank method.
+
+    :param values: The measured values.
+    :type values: list[float]
+    :param q: The quantile, between 0 and 1.
+    :type q: float
+
+    :return: The quantile, or 0 if there are no values.
+    :rtype: float
+    """
+    if not values: return 0.0
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered) + 0.5) - 1))]
+
+
+def summarize(name, latencies, elapsed, requests, wrong=0):
+    """
+    Builds the result of a benchmark phase.
+
+    :param name: The name of the phase.
+    :type name: str
+    :param latencies: The latency of every operation, in seconds.
+    :type latencies: list[float]
+    :param elapsed: The wall-clock duration of the phase, in seconds.
+    :type elapsed: float
+    :param requests: The number of requests the mock served during the phase.
+    :type requests: int
+    :param wrong: The number of joins resolved to another pass than the catalogue's best.
+    :type wrong: int
+
+    :return: The operation count, throughput, latency percentiles, request count and wrong
+        results.
+    :rtype: dict
+    """
+    return {
+        'phase': name,
+        'operations': len(latencies),
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': max(latencies, default=0.0) * 1000,
+        'requests': requests,
+        'wrong': wrong
+    }
+
+
+async def run_joins(client, usernames, price_max, workers):
+    """
+    Resolves every username like the join pipeline does, with at most `workers` joins in flight.
+
+    :param client: The client to benchmark.
+    :type client: RobloxClient
+    :param usernames: The joining usernames, in arrival order.
+    :type usernames: list[str]
+    :param price_max: The highest accepted game pass price.
+    :type price_max: int
+    :param workers: Maximum number of joins resolved at once.
+    :type workers: int
+
+    :return: The latency of every join, the duration of the whole run, in seconds, and the game
+        pass each successful join resolved to, by username.
+    :rtype: tuple[list[float], float, dict[str, dict | None]]
+    """
+    semaphore = asyncio.Semaphore(workers)
+    latencies = []
+    resolved = {}
+
+    async def join(username):
+        async with semaphore:
+            start = perf_counter()
+            try: resolved[username], _ = await client.get_gamepass(username, price_max)
+            except Exception: pass
+            latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*(join(username) for username in usernames))
+
+    return latencies, perf_counter() - start, resolved
+
+
+def count_wrong(mock, resolved, price_max):
+    """
+    Counts the joins that did not resolve to the best pass of the mock's catalogue, e.g. a
+    cheaper one picked before every game of the user was scanned.
+
+    :param mock: The mock the joins were resolved against.
+    :type mock: MockRoblox
+    :param resolved: The game pass of each join, as returned by `run_joins`.
+    :type resolved: dict[str, dict | None]
+    :param price_max: The highest accepted game pass price.
+    :type price_max: int
+
+    :return: The number of wrong results.
+    :rtype: int
+    """
+    return sum(
+        (gamepass['price'] if gamepass else None) != mock.best_price(username, price_max)
+        for username, gamepass in resolved.items()
+    )
+
+
+async def run_payouts(purchaser, count):
+    """
+    Runs `count` payouts one after another, like consecutive giveaway rounds.
+
+    :param purchaser: The purchase client to benchmark.
+    :type purchaser: PurchaseClient
+    :param count: The number of payouts.
+    :type count: int
+
+    :return: The latency of every payout and the duration of the whole run, in seconds.
+    :rtype: tuple[list[float], float]
+    """
+    gamepass = {'id': 1001000, 'name': 'Pass 1001000', 'price': 5, 'product_id': 501001000}
+    latencies = []
+
+    start = perf_counter()
+    for _ in range(count):
+        begin = perf_counter()
+        await purchaser.delete_buy(gamepass, 1)
+        latencies.append(perf_counter() - begin)
+
+    return latencies, perf_counter() - start
+
+
+async def benchmark(args):
+    """
+    Starts the mock, runs the cold join, warm join and payout phases against it and prints the
+    results. Every join is checked against the mock's catalogue, and the run fails if any of them
+    resolved to another pass than the best one (unless the mock injects errors, which leave some
+    games unscanned).
+
+    A last join phase runs against users owning fewer games than `scan_width`, with the latency
+    jittered so the best pass often sits in the game answering last: the lookup has to wait for
+    every game it started, even once none is left to start.
+
+    :param args: The parsed command line arguments.
+    :type args: argparse.Namespace
+
+    :return: The results of every phase.
+    :rtype: list[dict]
+    """
+    mock = MockRoblox(
+        users=args.users, games_per_user=args.games, passes_per_game=args.passes, max_price=args.max_price,
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed
+    )
+    url = await mock.start()
+
+    rng = Random(args.seed)
+    usernames = [f'User{rng.randrange(args.users)}' for _ in range(args.joins)]
+    results = []
+
+    def served():
+        return sum(mock.requests.values())
+
+    try:
+        rate_limits = None if args.rate_limit is None else dict.fromkeys(('users', 'games', 'economy'), args.rate_limit or None)
+
+        async with RobloxClient(
+            concurrency=args.concurrency, hosts={'users': url, 'games': url, 'economy': url}, rate_limits=rate_limits,
+            scan_width=args.scan_width
+        ) as client:
+            for phase in ('cold', 'warm'):
+                before = served()
+                latencies, elapsed, resolved = await run_joins(client, usernames, args.price_max, args.workers)
+                results.append(summarize(
+                    f'joins ({phase})', latencies, elapsed, served() - before, count_wrong(mock, resolved, args.price_max)
+                ))
+
+        async with PurchaseClient('mock-cookie', host=url) as purchaser:
+            before = served()
+            latencies, elapsed = await run_payouts(purchaser, args.payouts)
+            results.append(summarize('payouts', latencies, elapsed, served() - before))
+    finally: await mock.stop()
+
+    few = MockRoblox(
+        users=args.users, games_per_user=max(1, args.scan_width - 1), passes_per_game=args.passes,
+        max_price=args.max_price, latency=args.latency, jitter=max(args.jitter, args.latency),
+        error_rate=args.error_rate, seed=args.seed
+    )
+    url = await few.start()
+
+    try:
+        async with RobloxClient(
+            concurrency=args.concurrency, hosts={'users': url, 'games': url, 'economy': url}, scan_width=args.scan_width
+        ) as client:
+            before = sum(few.requests.values())
+            latencies, elapsed, resolved = await run_joins(client, usernames, args.price_max, args.workers)
+            results.append(summarize(
+                'joins (few)', latencies, elapsed, sum(few.requests.values()) - before,
+                count_wrong(few, resolved, args.price_max)
+            ))
+    finally: await few.stop()
+
+    print(f'{"phase":<14}{"ops":>8}{"ops/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"max ms":>10}{"requests":>10}{"wrong":>8}')
+    for result in results:
+        print(
+            f'{result["phase"]:<14}{result["operations"]:>8}{result["throughput"]:>10.1f}{result["p50_ms"]:>10.1f}'
+            f'{result["p99_ms"]:>10.1f}{result["max_ms"]:>10.1f}{result["requests"]:>10}{result["wrong"]:>8}'
+        )
+
+    if args.json:
+        with open(args.json, 'w') as f: json.dump({'arguments': vars(args), 'results': results}, f, indent=4)
+
+    if not args.error_rate and (wrong := sum(result['wrong'] for result in results)):
+        raise SystemExit(f'{wrong} joins resolved to another game pass than the best one')
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks join resolution and payouts against the local Roblox mock.')
+    add_arguments(parser)
+    parser.add_argument('--joins', type=int, default=2000, help='number of joins per phase')
+    parser.add_argument('--workers', type=int, default=8, help='joins resolved at once, like the pipeline workers')
+    parser.add_argument('--concurrency', type=int, default=16, help='maximum requests in flight')
+    parser.add_argument('--rate-limit', type=float, help='requests per second allowed on each host, 0 for no limit')
+    parser.add_argument('--price-max', type=int, default=5, help='highest accepted game pass price')
+    parser.add_argument('--scan-width', type=int, default=4, help='games of a user scanned at once')
+    parser.add_argument('--payouts', type=int, default=50, help='number of payouts')
+    parser.add_argument('--json', help='write the results to this JSON file, to compare runs')
+
+    asyncio.run(benchmark(parser.parse_args()))
@@ -0,0 +1,135 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from collections import OrderedDict
+from time import monotonic
+
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded in-memory cache with a time-to-live per entry and least-recently-used eviction.
+
+    Entries older than `ttl` seconds are treated as missing and dropped when looked up. Once the
+    cache holds `maxsize` entries, storing a new key evicts the least recently used one. Hits,
+    misses, evictions and expirations are counted and exposed through `stats()`.
+
+    :param maxsize: Maximum number of entries kept in the cache.
+    :type maxsize: int
+    :param ttl: Lifetime of an entry, in seconds.
+    :type ttl: float
+    :param clock: Function returning the current time in seconds, `time.monotonic` by default.
+    :type clock: Callable[[], float]
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, clock=monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, MISSING, count=False) is not MISSING
+
+    def get(self, key, default=None, count=True):
+        """
+        Returns the value stored under `key`, or `default` if it is missing or expired.
+
+        :param key: The key to look up.
+        :type key: Hashable
+        :param default: Value returned on a miss.
+        :type default: Any
+        :param count: Whether the lookup is counted as a hit or miss.
+        :type count: bool
+
+        :return: The cached value or `default`.
+        :rtype: Any
+        """
+        entry = self._data.get(key)
+
+        if entry is not None:
+            expires, value = entry
+
+            if expires > self.clock():
+                self._data.move_to_end(key)
+                if count: self.hits += 1
+                return value
+
+            del self._data[key]
+            self.expirations += 1
+
+        if count: self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores `value` under `key`, evicting the least recently used entry if the cache is full.
+
+        :param key: The key to store the value under.
+        :type key: Hashable
+        :param value: The value to store.
+        :type value: Any
+        :param ttl: Lifetime of this entry, in seconds. Defaults to the cache's `ttl`.
+        :type ttl: float | None
+
+        :return: None
+        """
+        self._data[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        """
+        Removes `key` from the cache and returns its value, or `default` if it is not cached.
+
+        :param key: The key to remove.
+        :type key: Hashable
+        :param default: Value returned if the key is not cached.
+        :type default: Any
+
+        :return: The removed value or `default`.
+        :rtype: Any
+        """
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        """
+        Removes every entry from the cache. Counters are kept.
+
+        :return: None
+        """
+        self._data.clear()
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        :return: The current size, hits, misses, evictions and expirations of the cache.
+        :rtype: dict[str, int]
+        """
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
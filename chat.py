@@ -0,0 +1,412 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from abc import ABC, abstractmethod
+from clock import SYSTEM_CLOCK
+from time import monotonic
+
+import argparse
+import aiohttp
+import asyncio
+import json
+import re
+
+
+YOUTUBE = 'https://www.youtube.com'
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/124.0.0.0 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9'
+}
+
+
+class ChatMessage:
+    """
+    A single chat message, independent of the backend it was read from.
+
+    :param author: The display name of the author.
+    :type author: str
+    :param message: The text of the message.
+    :type message: str
+    :param timestamp: When the message was sent, in seconds since the epoch.
+    :type timestamp: float
+    """
+
+    __slots__ = ('author', 'message', 'timestamp')
+
+    def __init__(self, author, message, timestamp):
+        self.author = author
+        self.message = message
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f'ChatMessage({self.author!r}, {self.message!r}, {self.timestamp!r})'
+
+
+class ChatSource(ABC):
+    """
+    Interface of a live chat source. `start()` connects to the chat, `get()` waits for and
+    returns the next batch of messages, `is_alive()` tells whether more messages can arrive and
+    `close()` releases the source.
+    """
+
+    async def start(self):
+        pass
+
+    @abstractmethod
+    def is_alive(self):
+        pass
+
+    @abstractmethod
+    async def get(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class YouTubeChatSource(ChatSource):
+    """
+    Asyncio-native YouTube live chat source built on the same innertube endpoint the YouTube web
+    player uses.
+
+    Each call to `get()` waits out the poll timeout the server suggested in its previous answer
+    (without blocking the event loop) and then fetches the messages posted since, so chat is read
+    exactly as often as YouTube asks for and no thread is involved.
+
+    :param video_id: The ID of the live stream.
+    :type video_id: str
+    :param timeout: Total timeout of a single request, in seconds.
+    :type timeout: float
+    """
+
+    def __init__(self, video_id, timeout=10):
+        self.video_id = video_id
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+        self._session = None
+        self._api_key = None
+        self._context = None
+        self._continuation = None
+        self._next_poll = 0.0
+
+    async def start(self):
+        """
+        Loads the live chat page of the stream and extracts the API key, client version and the
+        first continuation token from it.
+
+        :raises ValueError: If the page does not contain a live chat.
+
+        :return: None
+        """
+        self._session = aiohttp.ClientSession(headers=HEADERS, timeout=self.timeout)
+
+        async with self._session.get(f'{YOUTUBE}/live_chat', params={'is_popout': '1', 'v': self.video_id}) as response:
+            page = await response.text()
+
+        api_key = re.search(r'"INNERTUBE_API_KEY":\s*"([^"]+)"', page)
+        version = re.search(r'"INNERTUBE_CONTEXT_CLIENT_VERSION":\s*"([^"]+)"', page)
+        continuation = re.search(r'"continuation":\s*"([^"]+)"', page)
+
+        if not (api_key and version and continuation):
+            raise ValueError(f'No live chat found for video ID {self.video_id}')
+
+        self._api_key = api_key.group(1)
+        self._context = {'client': {'clientName': 'WEB', 'clientVersion': version.group(1)}}
+        self._continuation = continuation.group(1)
+
+    def is_alive(self):
+        return self._continuation is not None
+
+    async def get(self):
+        """
+        Waits for the suggested poll timeout and fetches the next batch of chat messages. A
+        failed poll raises and keeps the current continuation, so the next call retries it.
+
+        :raises aiohttp.ClientResponseError: If YouTube answers with an error status.
+        :raises ValueError: If the answer holds no live chat continuation.
+
+        :return: The new text messages, oldest first. Empty once the chat has ended.
+        :rtype: list[ChatMessage]
+        """
+        if self._continuation is None: return []
+
+        if (delay := self._next_poll - monotonic()) > 0: await asyncio.sleep(delay)
+
+        async with self._session.post(
+            f'{YOUTUBE}/youtubei/v1/live_chat/get_live_chat',
+            params={'key': self._api_key, 'prettyPrint': 'false'},
+            json={'context': self._context, 'continuation': self._continuation}
+        ) as response:
+            response.raise_for_status()
+            data = await response.json(content_type=None)
+
+        if (chat := data.get('continuationContents', {}).get('liveChatContinuation')) is None:
+            raise ValueError(f'No live chat continuation in the answer for video ID {self.video_id}')
+
+        continuations = chat.get('continuations') or [{}]
+        continuation = next(iter(continuations[0].values()), {})
+
+        self._continuation = continuation.get('continuation')
+        self._next_poll = monotonic() + min(max(continuation.get('timeoutMs', 1000), 500), 10000) / 1000
+
+        return [message for action in chat.get('actions', []) if (message := self._parse(action))]
+
+    @staticmethod
+    def _parse(action):
+        renderer = action.get('addChatItemAction', {}).get('item', {}).get('liveChatTextMessageRenderer')
+        if renderer is None: return None
+
+        text = ''.join(
+            run['text'] if 'text' in run else (run.get('emoji', {}).get('shortcuts') or [''])[0]
+            for run in renderer.get('message', {}).get('runs', [])
+        )
+
+        return ChatMessage(
+            renderer.get('authorName', {}).get('simpleText', ''),
+            text,
+            int(renderer.get('timestampUsec', 0)) / 1_000_000
+        )
+
+    async def close(self):
+        """
+        Ends the chat and closes the underlying session.
+
+        :return: None
+        """
+        self._continuation = None
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class PytchatChatSource(ChatSource):
+    """
+    Fallback chat source wrapping pytchat. pytchat is blocking, so all its calls run on a single
+    dedicated worker thread that is reused for every poll. The chat is created with
+    `interruptable=False`, so pytchat does not install a signal handler of its own.
+
+    :param video_id: The ID of the live stream.
+    :type video_id: str
+    """
+
+    def __init__(self, video_id):
+        self.video_id = video_id
+
+        self._chat = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pytchat')
+
+    async def _run(self, function):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function)
+
+    async def start(self):
+        import pytchat
+
+        self._chat = await self._run(lambda: pytchat.create(video_id=self.video_id, interruptable=False))
+
+    def is_alive(self):
+        return self._chat is not None and self._chat.is_alive()
+
+    async def get(self):
+        return await self._run(lambda: [
+            ChatMessage(item.author.name, item.message, item.timestamp / 1000)
+            for item in self._chat.get().sync_items()
+        ])
+
+    async def close(self):
+        if self._chat is not None:
+            await self._run(self._chat.terminate)
+            self._chat = None
+
+        self._executor.shutdown(wait=False)
+
+
+class ReplayChatSource(ChatSource):
+    """
+    Chat source replaying a capture recorded by `ChatRecorder`: a JSON-lines file with one
+    `{"author", "message", "timestamp"}` object per message, in chronological order.
+
+    With `speed` 1 the messages are handed out with their original timing, with any other
+    positive `speed` the timing is scaled by it (2 replays twice as fast), and with `speed` 0
+    the capture is replayed as fast as it can be consumed, `batch_size` messages per `get()`.
+    The file is streamed, so captures of any size replay in constant memory.
+
+    :param path: The path of the capture.
+    :type path: str
+    :param speed: The replay speed factor, 0 for maximum speed.
+    :type speed: float
+    :param batch_size: Maximum number of messages returned by a single `get()`.
+    :type batch_size: int
+    :param clock: The clock the replay is timed with.
+    :type clock: SystemClock
+    """
+
+    def __init__(self, path, speed=1.0, batch_size=200, clock=SYSTEM_CLOCK):
+        self.path = path
+        self.speed = speed
+        self.batch_size = batch_size
+        self.clock = clock
+
+        self._file = None
+        self._next = None
+        self._offset = None
+
+    async def start(self):
+        self._file = open(self.path, 'r', encoding='utf-8')
+        self._advance()
+
+    def _advance(self):
+        self._next = None
+
+        for line in self._file:
+            if line.strip():
+                entry = json.loads(line)
+                self._next = ChatMessage(entry.get('author', ''), entry.get('message', ''), float(entry.get('timestamp', 0)))
+                break
+
+    def is_alive(self):
+        return self._next is not None
+
+    async def get(self):
+        """
+        Waits until the next recorded message is due and returns every message due by then.
+
+        :return: The next batch of messages. Empty once the capture is exhausted.
+        :rtype: list[ChatMessage]
+        """
+        if self._next is None: return []
+
+        if not self.speed:
+            await asyncio.sleep(0)
+            due = float('inf')
+        else:
+            if self._offset is None: self._offset = self._next.timestamp - self.clock.monotonic() * self.speed
+
+            due = self._offset + self.clock.monotonic() * self.speed
+            if (wait := (self._next.timestamp - due) / self.speed) > 0:
+                await self.clock.sleep(wait)
+                due = self._offset + self.clock.monotonic() * self.speed
+
+        messages = []
+
+        while self._next is not None and self._next.timestamp <= due and len(messages) < self.batch_size:
+            messages.append(self._next)
+            self._advance()
+
+        return messages
+
+    async def close(self):
+        self._next = None
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ChatRecorder(ChatSource):
+    """
+    Wraps another chat source and appends every message it returns to a JSON-lines capture
+    that `ReplayChatSource` can replay.
+
+    :param source: The chat source to record.
+    :type source: ChatSource
+    :param path: The path of the capture; messages are appended if it already exists.
+    :type path: str
+    """
+
+    def __init__(self, source, path):
+        self.source = source
+        self.path = path
+        self.recorded = 0
+
+        self._file = None
+
+    async def start(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+        await self.source.start()
+
+    def is_alive(self):
+        return self.source.is_alive()
+
+    async def get(self):
+        messages = await self.source.get()
+
+        if messages and self._file is not None:
+            self._file.write(''.join(
+                json.dumps({'author': m.author, 'message': m.message, 'timestamp': m.timestamp}, ensure_ascii=False) + '\n'
+                for m in messages
+            ))
+            self._file.flush()
+            self.recorded += len(messages)
+
+        return messages
+
+    async def close(self):
+        await self.source.close()
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+CHAT_BACKENDS = {
+    'native': YouTubeChatSource,
+    'pytchat': PytchatChatSource,
+    'replay': ReplayChatSource
+}
+
+
+async def create_chat(source, backend='native', record=None, **options):
+    """
+    Creates and starts a chat source.
+
+    :param source: The ID of the live stream, or the path of the capture for the `replay`
+        backend.
+    :type source: str
+    :param backend: The chat backend, one of `CHAT_BACKENDS` (`native`, `pytchat` or `replay`).
+    :type backend: str
+    :param record: Optional path of a capture every received message is appended to.
+    :type record: str | None
+    :param options: Extra keyword arguments forwarded to the backend, e.g. `speed` for `replay`.
+
+    :return: The started chat source.
+    :rtype: ChatSource
+    """
+    chat = CHAT_BACKENDS[backend](source, **options)
+    if record: chat = ChatRecorder(chat, record)
+
+    try: await chat.start()
+    except BaseException:
+        await chat.close()
+        raise
+
+    return chat
+
+
+async def _record(args):
+    chat = ChatRecorder(CHAT_BACKENDS[args.backend](args.video_id), args.output)
+
+    try:
+        await chat.start()
+        print(f'Recording the chat of {args.video_id} to {args.output}, press Ctrl+C to stop...')
+
+        while chat.is_alive(): await chat.get()
+    finally:
+        await chat.close()
+        print(f'Recorded {chat.recorded} messages.')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Records a live chat to a JSON-lines capture for replay.')
+    parser.add_argument('video_id', help='the ID of the live stream')
+    parser.add_argument('output', help='the path of the capture')
+    parser.add_argument('--backend', choices=('native', 'pytchat'), default='native')
+
+    try: asyncio.run(_record(parser.parse_args()))
+    except KeyboardInterrupt: pass
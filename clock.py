@@ -0,0 +1,96 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from heapq import heappush, heappop
+from itertools import count
+
+import asyncio
+import time
+
+
+class SystemClock:
+    """
+    Clock backed by the real time and the event loop's timers. Components that wait or measure
+    time take a clock so they can be driven by a `VirtualClock` in simulations instead.
+    """
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    async def sleep(self, delay):
+        await asyncio.sleep(delay)
+
+
+class VirtualClock(SystemClock):
+    """
+    Discrete-event clock for simulations. Sleeping never waits for real: sleepers are queued by
+    deadline, and whenever the event loop has nothing else ready to run the clock jumps straight
+    to the earliest deadline and wakes that sleeper. Hours of giveaway rounds therefore run as
+    fast as the code itself executes.
+
+    Only waits made through `sleep()` are virtual; real I/O still takes real time, and the clock
+    may move on while it is in flight.
+
+    :param start: The initial time, in seconds since the epoch. Defaults to the current time.
+    :type start: float | None
+    """
+
+    def __init__(self, start=None):
+        self.now = time.time() if start is None else start
+
+        self._sleepers = []
+        self._sequence = count()
+        self._driver = None
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, delay):
+        """
+        Suspends the caller until the virtual time has advanced by `delay` seconds.
+
+        :param delay: The virtual time to wait, in seconds.
+        :type delay: float
+
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        heappush(self._sleepers, (self.now + max(delay, 0), next(self._sequence), future))
+
+        if self._driver is None or self._driver.done():
+            self._driver = loop.create_task(self._drive())
+
+        await future
+
+    async def _drive(self):
+        loop = asyncio.get_running_loop()
+
+        while self._sleepers:
+            # Let everything that is ready run first; `_ready` is the loop's queue of pending
+            # callbacks, so time only moves once the loop would otherwise be idle.
+            for _ in range(10000):
+                await asyncio.sleep(0)
+                if not getattr(loop, '_ready', None): break
+
+            if not self._sleepers: break
+
+            deadline, _, future = heappop(self._sleepers)
+            if future.done(): continue
+
+            self.now = max(self.now, deadline)
+            future.set_result(None)
+
+
+SYSTEM_CLOCK = SystemClock()
@@ -0,0 +1,171 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from journal import PayoutJournal, PayoutWorker
+from purchase import PurchaseClient
+from winners import WinnersStore
+from admission import InFlightLimit
+from giveaway import Giveaway
+from chat import create_chat
+from roblox import RobloxClient
+from logger import log_it, configure, flush
+from metrics import metrics, serve, report
+from tracing import tracer, profiler
+from events import events
+
+import asyncio
+
+
+class Engine:
+    """
+    The whole giveaway process of a configuration, independent of any frontend: it sets up the
+    Roblox lookup and purchase clients, the payout worker, the winners store, the metrics and the
+    chat of every stream, runs a `Giveaway` per stream and tears everything down once they stop.
+
+    `main.py` runs it on its own; the Qt frontend runs it on a worker thread and follows it on the
+    event bus, where it publishes `engine_started` and `engine_stopped` around the run, with the
+    engine itself as `engine` so a frontend can tell its engines apart.
+
+    With `streams`, a list of per-stream overrides of the configuration (e.g.
+    `{'video_id': ..., 'command_prefix': ...}`), one giveaway runs for each stream. They share the
+    lookup client, so its caches, connection pools and rate limits, as well as the winners and the
+    payout worker, which spends at most `purchase_budget` Robux across all of them, and the cap of
+    `max_in_flight` join resolutions.
+
+    :param config: The giveaway configuration (see `CONFIG` in main.py).
+    :type config: dict
+    :param cookie: The `.ROBLOSECURITY` cookie of the buying account.
+    :type cookie: str
+    """
+
+    def __init__(self, config, cookie):
+        self.config = config
+        self.cookie = cookie
+
+        self.giveaways = []
+
+        self._loop = None
+        self._task = None
+        self._stopping = False
+
+    async def run(self):
+        """
+        Runs the giveaways until their chats end, the process is interrupted or `stop()` is
+        called.
+
+        :return: None
+        """
+        config = self.config
+        configure(level=config['log_level'], jsonl_path=config['log_file'])
+        if config['trace_file']: tracer.configure(config['trace_file'])
+        if config['profile_dir']: profiler.configure(config['profile_dir'])
+
+        self._loop, self._task = asyncio.get_running_loop(), asyncio.current_task()
+        # A stop() arriving before the loop was known is honoured at the first await, like any other.
+        if self._stopping: self._task.cancel()
+
+        client = RobloxClient(
+            concurrency=config['max_concurrency'],
+            cache_size=config['cache_size'],
+            cache_ttl=config['cache_ttl'],
+            batch_window=config['batch_window'],
+            rate_limits=config['rate_limits'],
+            retries=config['retries'],
+            scan_width=config['scan_width']
+        )
+        purchaser = PurchaseClient(self.cookie)
+        payouts = PayoutWorker(
+            purchaser, PayoutJournal(config['payout_journal']),
+            retries=config['payout_retries'], budget=config['purchase_budget']
+        )
+        winners = WinnersStore(config['winners_db'], window=config['max_wins_window'])
+        streams = [{**config, **stream} for stream in config['streams'] or [{}]]
+        in_flight = InFlightLimit(config['max_in_flight'])
+        chats = []
+        server = None
+
+        collectors = [
+            lambda: [
+                (f'cache_{counter}', {'cache': name}, value)
+                for name, stats in client.cache_stats().items()
+                for counter, value in stats.items()
+            ],
+            lambda: [
+                (f'roblox_limiter_{key}', {'host': name}, value)
+                for name, stats in client.limiter_stats().items()
+                for key, value in stats.items()
+            ],
+            lambda: [
+                ('giveaway_payouts_queued', {}, payouts.pending()),
+                ('giveaway_winners', {}, len(winners)),
+                *([('payout_budget_remaining', {}, payouts.remaining())] if payouts.budget is not None else [])
+            ]
+        ]
+        for collector in collectors: metrics.add_collector(collector)
+        reporter = asyncio.create_task(report(metrics, config['metrics_interval']))
+
+        events.publish('engine_started', engine=self, streams=[stream['video_id'] for stream in streams])
+
+        try:
+            if config['metrics_port']:
+                # Metrics are optional: a taken port (e.g. by node_exporter) must not stop the giveaway.
+                try: server = await serve(metrics, port=config['metrics_port'])
+                except OSError as e: log_it(f"Metrics server not started on port {config['metrics_port']}: {e}", 2)
+
+            await payouts.start()
+
+            for stream in streams:
+                if stream['chat_replay']: chats.append(await create_chat(stream['chat_replay'], 'replay', speed=stream['replay_speed']))
+                else: chats.append(await create_chat(stream['video_id'], stream['chat_backend'], record=stream['chat_record']))
+
+            self.giveaways = [
+                Giveaway(
+                    stream, client, payouts, chat, winners=winners,
+                    name=stream['video_id'] if len(streams) > 1 else None, in_flight=in_flight
+                )
+                for stream, chat in zip(streams, chats)
+            ]
+            await asyncio.gather(*(giveaway.run() for giveaway in self.giveaways))
+
+        except asyncio.CancelledError:
+            if not self._stopping: raise
+            log_it('Giveaway stopped.')
+        except KeyboardInterrupt: log_it('Closing...')
+        except Exception as e: log_it(e, 2)
+        finally:
+            reporter.cancel()
+            if server: server.close()
+            for collector in collectors: metrics.remove_collector(collector)
+
+            await payouts.stop()
+
+            await asyncio.gather(client.close(), purchaser.close())
+            await asyncio.gather(*(chat.close() for chat in chats))
+            winners.close()
+            tracer.close()
+            flush()
+
+            self._loop = self._task = None
+            events.publish('engine_stopped', engine=self)
+
+    def stop(self):
+        """
+        Asks the engine to stop. Safe to call from any thread, and before `run()` has started, in
+        which case the run stops as soon as it begins.
+
+        :return: None
+        """
+        if self._stopping: return
+
+        self._stopping = True
+
+        # Without both, run() has not checked `_stopping` yet and will cancel itself.
+        loop, task = self._loop, self._task
+        if loop is None or task is None: return
+
+        try: loop.call_soon_threadsafe(task.cancel)
+        except RuntimeError: pass  # The run ended meanwhile and its loop is closed.
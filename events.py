@@ -0,0 +1,71 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+import threading
+import sys
+
+
+class EventBus:
+    """
+    In-process publish/subscribe channel between the giveaway engine and whatever watches it (the
+    Qt window, a headless log, ...), so the engine never depends on a frontend.
+
+    Events are a kind and a dict of data. Subscribers are called synchronously, on the thread that
+    published the event; a subscriber living on another thread (e.g. a Qt widget) hands the event
+    over to it itself. Publishing without subscribers costs next to nothing.
+    """
+
+    def __init__(self):
+        self._subscribers = ()
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback, kinds=None):
+        """
+        Registers a subscriber.
+
+        :param callback: Function called with the kind and the data of every event.
+        :type callback: Callable[[str, dict], None]
+        :param kinds: The kinds of events to receive, `None` for all of them.
+        :type kinds: Iterable[str] | None
+
+        :return: None
+        """
+        with self._lock:
+            self._subscribers += ((callback, frozenset(kinds) if kinds is not None else None),)
+
+    def unsubscribe(self, callback):
+        """
+        Unregisters a subscriber added with `subscribe`.
+
+        :param callback: The subscriber to remove.
+        :type callback: Callable[[str, dict], None]
+
+        :return: None
+        """
+        with self._lock:
+            self._subscribers = tuple(item for item in self._subscribers if item[0] != callback)
+
+    def publish(self, kind, **data):
+        """
+        Sends an event to the subscribers of its kind. A failing subscriber does not prevent the
+        others from receiving it.
+
+        :param kind: The kind of the event, e.g. `log` or `round_started`.
+        :type kind: str
+        :param data: The data of the event.
+
+        :return: None
+        """
+        for callback, kinds in self._subscribers:
+            if kinds is not None and kind not in kinds: continue
+
+            # Not logged: log lines are events too, and a failing log subscriber would loop.
+            try: callback(kind, data)
+            except Exception as e: print(f'Event subscriber failed on {kind}: {e!r}', file=sys.stderr)
+
+
+events = EventBus()
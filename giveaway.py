@@ -0,0 +1,405 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from participants import Participant, ParticipantRegistry
+from admission import AdmissionControl, InFlightLimit
+from winners import WinnersStore
+from pipeline import JoinPipeline
+from clock import SYSTEM_CLOCK
+from metrics import metrics
+from tracing import tracer, profiler
+from roblox import RobloxError, CircuitOpenError
+from events import events
+from logger import log_it
+from functools import partial
+
+import aiohttp
+import asyncio
+
+
+class Giveaway:
+    """
+    Runs the giveaway rounds of a single live chat.
+
+    Chat ingestion and join resolution run in a `JoinPipeline`: its producer polls the chat and
+    queues the usernames of `join` commands, and its workers run the cheap checks and admission
+    on them and spawn a task resolving each admitted join, which adds the user to the current
+    round if eligible. How many resolutions run at once is therefore bounded by `max_in_flight`,
+    not by the number of workers. The round loop itself only times the collection windows, which
+    follow each other back to back: when a window closes, the winner is drawn and paid by a
+    background task while the next round is already collecting joins.
+
+    Joins go through an `AdmissionControl` before any lookup, which sheds them under load
+    (per-user cooldown, resolutions in flight, participants per round), and joins waiting in the
+    queue longer than `max_join_wait` are skipped, so a chat flood cannot make resolution slow.
+
+    The progress of the rounds is published on the event bus (`round_started`, `round_closed`,
+    `winner` and `payout` events, each with the `stream` name) for frontends to follow.
+
+    :param config: The giveaway configuration (see `CONFIG` in main.py).
+    :type config: dict
+    :param client: The client used for the Roblox lookups.
+    :type client: RobloxClient
+    :param payouts: The worker buying the winners' game passes.
+    :type payouts: PayoutWorker
+    :param chat: The live chat of the stream.
+    :type chat: ChatSource
+    :param winners: The record of past wins, in memory only by default.
+    :type winners: WinnersStore | None
+    :param name: The name of the stream, labelling its metrics and log lines when several
+        streams run in the same process.
+    :type name: str | None
+    :param in_flight: The cap on resolutions in flight, to share it with the giveaways of other
+        streams; by default the giveaway has its own, of `max_in_flight`.
+    :type in_flight: InFlightLimit | None
+    :param clock: The clock the rounds are timed with.
+    :type clock: SystemClock
+    """
+
+    def __init__(self, config, client, payouts, chat, winners=None, name=None, in_flight=None, clock=SYSTEM_CLOCK):
+        self.config = config
+        self.client = client
+        self.payouts = payouts
+        self.chat = chat
+        self.name = name
+        self.labels = {'stream': name} if name else {}
+        self.clock = clock
+
+        self.participants = ParticipantRegistry()
+        self.winners = winners if winners is not None else WinnersStore(clock=clock)
+        self.pipeline = JoinPipeline(
+            self.poll, self.handle,
+            workers=config['workers'],
+            maxsize=config['queue_size'],
+            overflow=config['queue_overflow'],
+            max_wait=config['max_join_wait'],
+            clock=clock
+        )
+        self.admission = AdmissionControl(
+            round_cap=config['round_cap'],
+            cooldown=config['join_cooldown'],
+            policy=config['shed_policy'],
+            limit=in_flight if in_flight is not None else InFlightLimit(config['max_in_flight']),
+            labels=self.labels,
+            clock=clock
+        )
+
+        self.round = 0
+
+        self._pending = {}
+        self._payouts = set()
+        self._payout_lock = asyncio.Lock()
+
+        metrics.add_collector(self.collect)
+
+    def log(self, message, message_type=1):
+        """
+        Logs a message, prefixed with the name of the stream if it has one.
+
+        :param message: The message, or the exception for errors.
+        :type message: str | Exception
+        :param message_type: The type of the message, see `log_it`.
+        :type message_type: int
+
+        :return: None
+        """
+        with tracer.span('log'):
+            log_it(f'[{self.name}] {message}' if self.name and isinstance(message, str) else message, message_type)
+
+    def _report_name(self):
+        return f'{self.name}-round-{self.round + 1}' if self.name else f'round-{self.round + 1}'
+
+    def collect(self):
+        """
+        Reports the join queue and round state as gauges for the metrics registry.
+
+        :return: The `(name, labels, value)` gauges.
+        :rtype: list[tuple[str, dict, float]]
+        """
+        stats = self.pipeline.stats()
+
+        return [
+            ('chat_queue_depth', self.labels, stats['depth']),
+            ('chat_queue_lag_seconds', self.labels, stats['lag']),
+            ('chat_queue_max_lag_seconds', self.labels, stats['max_lag']),
+            ('chat_queue_dropped', self.labels, stats['dropped']),
+            ('chat_queue_expired', self.labels, stats['expired']),
+            ('giveaway_joins_in_flight', self.labels, len(self._pending)),
+            ('giveaway_participants', self.labels, len(self.participants)),
+            ('giveaway_payouts_pending', self.labels, len(self._payouts))
+        ]
+
+    async def poll(self):
+        """
+        Fetches the next chat items and extracts the usernames of the join commands among them.
+
+        :return: The usernames of the join commands, capitalized. An empty string stands for a
+            join command without a username.
+        :rtype: list[str]
+        """
+        if not self.chat.is_alive():
+            await self.clock.sleep(1)
+            return []
+
+        with tracer.span('chat.receive') as span:
+            items = await self.chat.get()
+            span['messages'] = len(items)
+
+        prefix = self.config['command_prefix']
+
+        with tracer.span('chat.parse') as span:
+            if items and tracer.enabled: span['lag'] = self.clock.time() - min(item.timestamp for item in items)
+
+            usernames = [
+                message.replace(prefix, '').capitalize()
+                for item in items
+                if (message := str(item.message).lower().replace(' ', '')) and message.startswith(prefix)
+            ]
+            span['joins'] = len(usernames)
+
+        return usernames
+
+    async def handle(self, username):
+        """
+        Checks the eligibility of a joining user and whether admission control lets the join
+        through, and if so starts resolving them in the background. The pipeline worker is free
+        again at once: the lookups are only bounded by `max_in_flight`, not by the workers.
+
+        :param username: The username of the joining user.
+        :type username: str
+
+        :return: None
+        """
+        with tracer.span('join', username=username) as join:
+            with tracer.span('dedupe'):
+                eligible = username and self.winners.wins(username) <= self.config['max_wins_per_user']
+                duplicate = eligible and (username in self._pending or username in self.participants)
+
+            if not eligible:
+                join['result'] = 'ineligible'
+                metrics.inc('giveaway_joins_total', result='ineligible', **self.labels)
+                self.log(f'User {username if username else "(Not Found)"} is not eligible for the giveaway.')
+                return
+
+            if duplicate:
+                join['result'] = 'duplicate'
+                metrics.inc('giveaway_joins_total', result='duplicate', **self.labels)
+                self.log(f'User {username} is already in giveaway!')
+                return
+
+            with tracer.span('admission') as span:
+                span['shed'] = shed = self.admission.admit(username, self.participants, len(self._pending))
+
+            if shed:
+                join['result'] = 'shed'
+                metrics.inc('giveaway_joins_total', result='shed', **self.labels)
+                return
+
+            join['result'] = 'admitted'
+            task = self._pending[username] = asyncio.create_task(self.resolve(username))
+            task.add_done_callback(partial(self._resolved, username))
+
+    def _resolved(self, username, task):
+        # Gives the admission slot back from the task itself: a task cancelled before it started
+        # (e.g. on shutdown) never runs the body of resolve().
+        if self._pending.get(username) is task: del self._pending[username]
+        self.admission.release()
+
+    async def resolve(self, username):
+        """
+        Resolves an admitted join and, if the user has an eligible game pass (or just exists, in
+        lazy mode), adds them to the current round. Under the `reservoir` policy a full round makes
+        room by evicting a random participant.
+
+        Joins failing because Roblox cannot be reached or answers with an error are logged on one
+        line, without a traceback, and not at all while the circuit of the host is open: the client
+        logs the outage itself.
+
+        :param username: The username of the joining user.
+        :type username: str
+
+        :return: None
+        """
+        with tracer.span('resolve', username=username) as span:
+            try: gamepass, user_id = await self.resolve_join(username)
+            except Exception as e:
+                span['result'] = 'error'
+                metrics.inc('giveaway_joins_total', result='error', **self.labels)
+
+                if isinstance(e, CircuitOpenError): return
+                if isinstance(e, (RobloxError, aiohttp.ClientError, asyncio.TimeoutError)):
+                    self.log(f'Could not resolve {username}: {e!r}', 2)
+                else: self.log(e, 2)
+                return
+            finally: self._pending.pop(username, None)
+
+            if gamepass or (self.config['lazy_resolve'] and user_id):
+                with tracer.span('admit'):
+                    if username not in self.participants: self.admission.make_room(self.participants)
+                    admitted = self.participants.add(Participant(username, user_id, gamepass))
+
+                if admitted:
+                    span['result'] = 'joined'
+                    metrics.inc('giveaway_joins_total', result='joined', **self.labels)
+                    self.log(f'Successfully joined {username}!')
+                    return
+
+            span['result'] = 'rejected'
+            metrics.inc('giveaway_joins_total', result='rejected', **self.labels)
+
+    async def resolve_join(self, username):
+        """
+        Resolves what is needed to admit a user into the giveaway. Normally this is the user's best
+        eligible game pass; with `lazy_resolve` enabled only the user's existence is checked and the
+        game pass is looked up later, for the drawn winner alone.
+
+        :param username: The username of the joining user.
+        :type username: str
+
+        :return: A tuple containing the game pass details (always `None` in lazy mode) and the
+            user ID, as returned by `RobloxClient.get_gamepass`.
+        :rtype: tuple[dict | None, int | None]
+        """
+        if self.config['lazy_resolve']: return None, await self.client.get_user_id(username)
+
+        return await self.client.get_gamepass(username, self.config['price_max'])
+
+    async def draw_winner(self, participants):
+        """
+        Randomly draws the winner among the participants. Participants admitted lazily get their game
+        pass resolved here; if the drawn one has no eligible game pass they are removed from the
+        giveaway and another winner is drawn.
+
+        :param participants: The participants of the round.
+        :type participants: ParticipantRegistry
+
+        :return: The winning participant, or `None` if no participant is eligible.
+        :rtype: Participant | None
+        """
+        while winner := participants.draw():
+            if winner.gamepass is None:
+                try: winner.gamepass = await self.client.get_best_gamepass(winner.user_id, self.config['price_max'])
+                except Exception as e: self.log(e, 2)
+
+                if winner.gamepass is None:
+                    participants.remove(winner.username)
+
+                    self.log(f'User {winner.username} has no eligible gamepass, drawing again...')
+                    continue
+
+            return winner
+
+        return None
+
+    async def run_round(self):
+        """
+        Runs the collection window of a round. As soon as it closes the next round's window can
+        open: the round's participants are handed to a background payout task, and joins arriving
+        from then on go to the next round.
+
+        :return: The payout task of the round.
+        :rtype: asyncio.Task
+        """
+        self.round += 1
+        self.log(f'Starting giveaway #{self.round}...')
+        start_time = self.clock.time()
+        events.publish('round_started', stream=self.name, number=self.round, ends_at=start_time + self.config['giveaway_threshold'])
+
+        while self.chat.is_alive() and (remaining := self.config['giveaway_threshold'] - (self.clock.time() - start_time)) > 0:
+            await self.clock.sleep(min(remaining, 1))
+
+        participants, self.participants = self.participants, ParticipantRegistry()
+        stats = self.pipeline.stats()
+        shed = self.admission.new_round()
+
+        self.log(f'Chat queue: {stats["depth"]} waiting, {stats["lag"]:.2f}s lag, {stats["dropped"]} dropped, {stats["expired"]} expired')
+        if shed: self.log(f'Shed {sum(shed.values())} joins (' + ', '.join(f'{count} {reason}' for reason, count in shed.items()) + ')')
+        events.publish('round_closed', stream=self.name, number=self.round, participants=len(participants))
+
+        task = asyncio.create_task(self.payout(self.round, participants))
+        self._payouts.add(task)
+        task.add_done_callback(self._payouts.discard)
+
+        return task
+
+    async def payout(self, number, participants):
+        """
+        Draws the winner of a closed round and has the payout worker buy their game pass, pausing
+        for the configured `announce_delays` between the announcements. Payouts run one at a
+        time, in round order, while the following rounds keep collecting joins.
+
+        :param number: The number of the round.
+        :type number: int
+        :param participants: The participants of the round.
+        :type participants: ParticipantRegistry
+
+        :return: None
+        """
+        delays = self.config['announce_delays']
+
+        async with self._payout_lock:
+            try:
+                self.log(f'Selecting the winner of giveaway #{number}...')
+                await self.clock.sleep(delays['select'])
+
+                if not (winner := await self.draw_winner(participants)):
+                    self.log('No one entered the giveaway..!?')
+                    return
+
+                self.log(f'Winner is... {winner.username}!')
+                events.publish('winner', stream=self.name, number=number, username=winner.username, price=winner.gamepass['price'])
+
+                if not self.payouts.affordable(winner.gamepass['price']):
+                    metrics.inc('payouts_total', result='over_budget', **self.labels)
+                    self.log('The purchase budget is spent, no gamepass will be bought.', 2)
+                    return
+
+                self.winners.add(winner.username, winner.user_id, winner.gamepass)
+
+                await self.clock.sleep(delays['announce'])
+                self.log(f'Buying the {winner.gamepass["price"]}R$ gamepass...')
+                result = await (await self.payouts.submit(winner.username, winner.user_id, winner.gamepass))
+                await self.clock.sleep(delays['result'])
+                events.publish('payout', stream=self.name, number=number, username=winner.username, result=result)
+
+                if result.get('purchased', False):
+                    metrics.inc('payouts_total', result='purchased', **self.labels)
+                    self.log('Successfully bought the gamepass!')
+                else:
+                    metrics.inc('payouts_total', result='failed', **self.labels)
+                    self.log(f'Failed to buy the gamepass: {result}', 2)
+            except Exception as e:
+                metrics.inc('payouts_total', result='error', **self.labels)
+                self.log(e, 2)
+
+    async def run(self, rounds=None):
+        """
+        Starts the join pipeline and runs giveaway rounds back to back for as long as the chat is
+        alive. Once the rounds stop, the payouts still in progress are awaited.
+
+        :param rounds: Optional number of rounds after which to stop.
+        :type rounds: int | None
+
+        :return: None
+        """
+        await self.pipeline.start()
+
+        try:
+            while self.chat.is_alive() and rounds != 0:
+                if rounds is not None: rounds -= 1
+
+                try:
+                    with metrics.timer('round_seconds', **self.labels), profiler.capture(self._report_name()):
+                        await self.run_round()
+                except Exception as e: self.log(e, 2)
+        finally:
+            await self.pipeline.stop()
+
+            for task in (resolving := list(self._pending.values())): task.cancel()
+            await asyncio.gather(*resolving, return_exceptions=True)
+            if self._payouts: await asyncio.gather(*self._payouts, return_exceptions=True)
+            metrics.remove_collector(self.collect)
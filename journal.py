@@ -0,0 +1,295 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from clock import SYSTEM_CLOCK
+from metrics import metrics
+from logger import log_it
+from uuid import uuid4
+
+import asyncio
+import json
+import os
+
+
+STATES = ('intent', 'revoked', 'purchased', 'failed')
+PENDING_STATES = ('intent', 'revoked')
+
+
+class PayoutJournal:
+    """
+    Append-only, crash-safe record of every payout. Each payout moves through `intent` (the winner
+    and game pass were decided), `revoked` (the buying account gave the pass up) and finally
+    `purchased` or `failed`; every transition is appended as one JSON line.
+
+    `append()` only returns once its line is on disk. Lines appended while a write is in progress
+    are grouped into the next write, so a burst of transitions costs a single `fsync`.
+
+    :param path: The path of the journal file, `None` to keep the journal in memory only.
+    :type path: str | None
+    :param clock: The clock the entries are timestamped with.
+    :type clock: SystemClock
+    """
+
+    def __init__(self, path, clock=SYSTEM_CLOCK):
+        self.path = path
+        self.clock = clock
+
+        self._buffer = []
+        self._writer = None
+
+    def recover(self):
+        """
+        Reads the journal back and folds every payout to its latest state.
+
+        :return: The payouts that were not finished, oldest first, each with its `id`, `state`
+            and intent details.
+        :rtype: list[dict]
+        """
+        if not self.path or not os.path.exists(self.path): return []
+
+        payouts = {}
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try: entry = json.loads(line)
+                except ValueError: continue  # A line torn by a crash mid-write.
+
+                payouts.setdefault(entry['id'], {}).update(entry)
+
+        return [payout for payout in payouts.values() if payout.get('state') in PENDING_STATES]
+
+    async def append(self, payout_id, state, **details):
+        """
+        Appends a state transition and waits until it is durable.
+
+        :param payout_id: The ID of the payout.
+        :type payout_id: str
+        :param state: One of `STATES`.
+        :type state: str
+        :param details: Extra fields to record with the transition.
+
+        :return: None
+        """
+        line = json.dumps({'id': payout_id, 'state': state, 'time': self.clock.time(), **details}, ensure_ascii=False)
+        if not self.path: return
+
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append((line, future))
+
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write())
+
+        await asyncio.shield(future)
+
+    async def _write(self):
+        loop = asyncio.get_running_loop()
+
+        while self._buffer:
+            batch, self._buffer = self._buffer, []
+
+            try: await loop.run_in_executor(None, self._sync, [line for line, _ in batch])
+            except Exception as e:
+                for _, future in batch: future.set_exception(e)
+                continue
+
+            metrics.inc('payout_journal_syncs_total')
+            for _, future in batch: future.set_result(None)
+
+    def _sync(self, lines):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(line + '\n' for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class PayoutWorker:
+    """
+    Dedicated worker carrying out the payouts, one at a time and in order, from a queue fed by
+    `submit()`. Every step is journaled before the next one starts, which makes payouts safe to
+    retry and to recover after a crash:
+
+    - from `intent`, the pass may or may not have been revoked yet, so it is revoked only if the
+      account still owns it, and the whole payout is simply run again;
+    - from `revoked`, the account owned no copy of the pass, so if it owns one now the purchase
+      went through (its response was lost) and it is not bought again.
+
+    Failed steps are retried up to `retries` times with a growing delay. Unfinished payouts found
+    in the journal are queued again by `start()`.
+
+    With a `budget`, the worker is the single place spending Robux for every stream of the
+    process: each submitted payout reserves its price, given back if the payout fails, and payouts
+    the remaining budget cannot cover are refused.
+
+    :param purchaser: The client buying the game passes.
+    :type purchaser: PurchaseClient
+    :param journal: The journal the payouts are recorded in.
+    :type journal: PayoutJournal
+    :param retries: How many times a failed payout is attempted again.
+    :type retries: int
+    :param retry_delay: Delay before the first retry, doubled on each further one, in seconds.
+    :type retry_delay: float
+    :param budget: Most Robux spent by this run, `None` for no limit.
+    :type budget: int | None
+    :param clock: The clock the retries are timed with.
+    :type clock: SystemClock
+    """
+
+    def __init__(self, purchaser, journal, retries=3, retry_delay=2.0, budget=None, clock=SYSTEM_CLOCK):
+        self.purchaser = purchaser
+        self.journal = journal
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.budget = budget
+        self.clock = clock
+
+        self.reserved = 0
+
+        self._queue = asyncio.Queue()
+        self._results = {}
+        self._task = None
+
+    async def start(self):
+        """
+        Queues the unfinished payouts of the journal again and starts the worker.
+
+        :return: None
+        """
+        if self._task is not None: return
+
+        for payout in self.journal.recover():
+            log_it(f'Recovering the {payout["state"]} payout of {payout["username"]}...')
+            metrics.inc('payouts_recovered_total')
+            self.reserved += payout['gamepass']['price']
+            self._queue.put_nowait(payout)
+
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the worker. A payout interrupted midway stays in the journal and is recovered by
+        the next `start()`.
+
+        :return: None
+        """
+        if self._task is None: return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def affordable(self, price):
+        """
+        Tells whether the remaining budget covers a purchase.
+
+        :param price: The price of the game pass, in Robux.
+        :type price: int
+
+        :return: `True` if there is no budget or enough of it is left.
+        :rtype: bool
+        """
+        return self.budget is None or self.reserved + price <= self.budget
+
+    def remaining(self):
+        """
+        Returns the budget not spent or reserved by queued payouts yet.
+
+        :return: The remaining Robux, `None` if there is no budget.
+        :rtype: int | None
+        """
+        return None if self.budget is None else self.budget - self.reserved
+
+    async def submit(self, username, user_id, gamepass):
+        """
+        Journals the intent of a payout and queues it. The caller does not wait for the purchase.
+
+        :param username: The username of the winner.
+        :type username: str
+        :param user_id: The user ID of the winner, who sells the game pass.
+        :type user_id: int
+        :param gamepass: The game pass to buy, with its `id`, `name`, `price` and `product_id`.
+        :type gamepass: dict
+
+        :return: A future resolved with the decoded response of the purchase call once the
+            payout is over, or at once with a `BudgetExhausted` reason if the budget cannot cover it.
+        :rtype: asyncio.Future
+        """
+        future = asyncio.get_running_loop().create_future()
+
+        if not self.affordable(gamepass['price']):
+            metrics.inc('payouts_refused_total')
+            future.set_result({'purchased': False, 'reason': 'BudgetExhausted'})
+            return future
+
+        self.reserved += gamepass['price']
+        payout = {'id': uuid4().hex, 'state': 'intent', 'username': username, 'user_id': user_id, 'gamepass': gamepass}
+
+        try: await self.journal.append(payout['id'], 'intent', username=username, user_id=user_id, gamepass=gamepass)
+        except BaseException:
+            self.reserved -= gamepass['price']
+            raise
+
+        self._results[payout['id']] = future
+        self._queue.put_nowait(payout)
+
+        return future
+
+    async def _run(self):
+        while True:
+            payout = await self._queue.get()
+
+            try:
+                with metrics.timer('payout_seconds'): result = await self._process(payout)
+            except Exception as e:
+                log_it(e, 2)
+                result = {'purchased': False, 'reason': 'JournalError'}
+
+            if not result.get('purchased', False): self.reserved -= payout['gamepass']['price']
+            if (future := self._results.pop(payout['id'], None)) and not future.done(): future.set_result(result)
+
+    async def _process(self, payout):
+        gamepass = payout['gamepass']
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                metrics.inc('payout_retries_total')
+                await self.clock.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+            try:
+                if payout['state'] == 'intent':
+                    # Revoking a pass the account does not own fails, and is not needed to buy it.
+                    if await self.purchaser.owns(gamepass) and (status := await self.purchaser.revoke(gamepass)) != 200:
+                        raise RuntimeError(f'Revoking the gamepass failed with status {status}')
+
+                    payout['state'] = 'revoked'
+                    await self.journal.append(payout['id'], 'revoked')
+
+                elif await self.purchaser.owns(gamepass):
+                    await self.journal.append(payout['id'], 'purchased', recovered=True)
+                    return {'purchased': True, 'reason': 'AlreadyOwned'}
+
+                result = await self.purchaser.purchase(gamepass, payout['user_id'])
+            except asyncio.CancelledError: raise
+            except Exception as e:
+                log_it(f'Payout to {payout["username"]} failed: {e!r}', 2)
+                continue
+
+            if result.get('purchased', False):
+                await self.journal.append(payout['id'], 'purchased')
+                return result
+
+            if result.get('reason') and not result.get('errors'):
+                # A definitive refusal (price changed, not enough Robux, ...): nothing to retry.
+                await self.journal.append(payout['id'], 'failed', reason=result['reason'])
+                return result
+
+            log_it(f'Payout to {payout["username"]} failed: {result}', 2)
+
+        await self.journal.append(payout['id'], 'failed', reason='RetriesExhausted')
+        return {'purchased': False, 'reason': 'RetriesExhausted'}
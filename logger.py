@@ -5,9 +5,153 @@
 ╚════════════════════════════════════════════════════════════╝
 """
 
+from time import time, monotonic
 from datetime import datetime
+from queue import SimpleQueue, Empty
+from events import events
 
 import traceback
+import threading
+import atexit
+import json
+import sys
+
+
+LEVELS = {'info': 1, 'error': 2}
+LABELS = {1: 'INFO', 2: 'ERROR'}
+
+_settings = {'level': 1, 'dedupe_window': 5.0, 'batch_size': 256}
+_stats = {'logged': 0, 'filtered': 0, 'suppressed': 0}
+
+_queue = SimpleQueue()
+_recent = {}
+_lock = threading.Lock()
+_writer = None
+_sink = None
+
+
+def configure(level='info', jsonl_path=None, dedupe_window=5.0, batch_size=256) -> None:
+    """
+    Configures the logging backend. Can be called at any time; the new settings apply to the
+    messages logged afterwards.
+
+    :param level: The lowest level that is logged, `info` (everything) or `error` (errors and
+        unspecified types only). Filtered messages are dropped before any formatting happens.
+    :type level: str
+    :param jsonl_path: Optional path of a file every record is also appended to, one JSON object
+        per line. `None` disables the file sink.
+    :type jsonl_path: str | None
+    :param dedupe_window: Identical messages logged again within this many seconds are
+        suppressed and only counted; the count is reported with the next occurrence that gets
+        through. 0 disables the suppression.
+    :type dedupe_window: float
+    :param batch_size: Maximum number of records written at once by the background writer.
+    :type batch_size: int
+    :return: None
+    """
+    global _sink
+
+    _settings.update(level=LEVELS[level], dedupe_window=dedupe_window, batch_size=batch_size)
+
+    with _lock:
+        if _sink is not None: _sink.close()
+        _sink = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path else None
+
+
+def stats() -> dict:
+    """
+    Returns the counters of the logging backend: messages handed to the writer, messages
+    dropped by the level filter and duplicates suppressed.
+
+    :return: The `logged`, `filtered` and `suppressed` counts.
+    :rtype: dict[str, int]
+    """
+    return dict(_stats)
+
+
+def flush(timeout=5.0) -> None:
+    """
+    Blocks until every message logged so far has been written, or until `timeout` expires.
+
+    :param timeout: Maximum time to wait, in seconds.
+    :type timeout: float
+    :return: None
+    """
+    if _writer is None: return
+
+    done = threading.Event()
+    _queue.put(done)
+    done.wait(timeout)
+
+
+def _format(record):
+    created, message_type, message, suppressed = record
+    time_now = datetime.fromtimestamp(created)
+    line = None
+
+    match message_type:
+        case 1: text = f"[{time_now}] - [INFO] : {message}"
+        case 2:
+            if isinstance(message, Exception) and (tb := traceback.extract_tb(message.__traceback__)):
+                line = tb[-1].lineno
+                text = f"[{time_now}] - [ERROR] 🔴 : {line} | {tb}"
+            else: text = f"[{time_now}] - [ERROR] 🔴 : {message}"
+
+        case _: text = f"[{time_now}] - [WHAT?!] 🔴: {message}"
+
+    if suppressed: text += f" (suppressed {suppressed} duplicates)"
+
+    entry = {
+        'time': time_now.isoformat(),
+        'level': LABELS.get(message_type, 'UNKNOWN'),
+        'message': str(message),
+        'line': line,
+        'suppressed': suppressed
+    }
+
+    return text, entry
+
+
+def _write(records):
+    lines, entries = zip(*map(_format, records))
+
+    sys.stdout.write('\n'.join(lines) + '\n')
+    sys.stdout.flush()
+
+    for (_, message_type, _, _), text in zip(records, lines): events.publish('log', text=text, level=message_type)
+
+    with _lock:
+        if _sink is not None:
+            _sink.write(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries))
+            _sink.flush()
+
+
+def _run():
+    while True:
+        batch = [_queue.get()]
+
+        try:
+            while len(batch) < _settings['batch_size']:
+                batch.append(_queue.get_nowait())
+        except Empty: pass
+
+        records = [item for item in batch if isinstance(item, tuple)]
+        if records:
+            try: _write(records)
+            except Exception as e: print(f"[{datetime.now()}] - [ERROR] 🔴 : Logger failed: {e!r}", file=sys.stderr)
+
+        for item in batch:
+            if isinstance(item, threading.Event): item.set()
+
+
+def _start():
+    global _writer
+
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run, name='logger', daemon=True)
+            _writer.start()
+            atexit.register(flush)
 
 
 def log_it(message, message_type=1) -> None:
@@ -16,9 +160,15 @@ def log_it(message, message_type=1) -> None:
     additional context depending on the type. Supports three types: INFO (1), ERROR (2),
     and a generic fallback for all others.
 
+    The call only filters the message and queues it; formatting and writing happen in batches
+    on a background thread, so logging never blocks the event loop. Every written line is also
+    published on the event bus as a `log` event, from that thread. Repeats of the same message
+    within the dedupe window are suppressed (see `configure`).
+
     :param message: The message content to be logged. If the message_type is ERROR (2),
         the `message` is expected to be an instance of an exception containing traceback
-        information. Otherwise, it can be any string describing the log content.
+        information or a string describing the error. Otherwise, it can be any string
+        describing the log content.
     :type message: Union[Exception, str]
     :param message_type: The type of the message being logged. Defaults to 1 (INFO).
         Accepted values:
@@ -28,14 +178,28 @@ def log_it(message, message_type=1) -> None:
     :type message_type: int, optional
     :return: None
     """
-    time_now = datetime.now()
+    if (2 if message_type != 1 else 1) < _settings['level']:
+        _stats['filtered'] += 1
+        return
 
-    match message_type:
-        case 1: print(f"[{time_now}] - [INFO] : {message}")
-        case 2:
+    suppressed = 0
+
+    if _settings['dedupe_window'] and isinstance(message, str):
+        key = (message_type, message)
+        now = monotonic()
+        last, count = _recent.get(key, (0.0, 0))
+
+        if now - last < _settings['dedupe_window']:
+            _recent[key] = (last, count + 1)
+            _stats['suppressed'] += 1
+            return
+
+        if len(_recent) >= 10000: _recent.clear()
+
+        _recent[key] = (now, 0)
+        suppressed = count
 
-            tb = message.__traceback__
-            message = traceback.extract_tb(tb)
-            print(f"[{time_now}] - [ERROR] 🔴 : {message[-1].lineno} | {message}")
+    if _writer is None: _start()
 
-        case _: print(f"[{time_now}] - [WHAT?!] 🔴: {message}")
\ No newline at end of file
+    _stats['logged'] += 1
+    _queue.put((time(), message_type, message, suppressed))
@@ -0,0 +1,305 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from contextlib import contextmanager
+from time import perf_counter
+from logger import log_it
+from bisect import bisect_left
+
+import asyncio
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values, with the bucket layout Prometheus expects.
+
+    :param buckets: Upper bounds of the buckets, in increasing order.
+    :type buckets: tuple[float, ...]
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Estimates a quantile as the upper bound of the bucket it falls into.
+
+        :param q: The quantile, between 0 and 1.
+        :type q: float
+
+        :return: The estimated quantile, `inf` if it falls past the last bucket, or 0 if nothing
+            was observed.
+        :rtype: float
+        """
+        if not self.count: return 0.0
+
+        rank, seen = q * self.count, 0
+
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank: return bound
+
+        return float('inf')
+
+
+class MetricsRegistry:
+    """
+    In-process registry of counters and latency histograms, keyed by metric name and labels.
+
+    Values that already live elsewhere (cache sizes, queue depth, ...) are not copied into the
+    registry; instead, collectors registered with `add_collector` are called whenever the metrics
+    are rendered and return them as gauges.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.collectors = []
+
+    def inc(self, name, value=1, **labels):
+        """
+        Increments a counter.
+
+        :param name: The name of the counter.
+        :type name: str
+        :param value: The amount to add.
+        :type value: float
+        :param labels: The labels of the counter.
+
+        :return: None
+        """
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """
+        Records a value in a histogram.
+
+        :param name: The name of the histogram.
+        :type name: str
+        :param value: The observed value, usually a duration in seconds.
+        :type value: float
+        :param labels: The labels of the histogram.
+
+        :return: None
+        """
+        key = (name, tuple(sorted(labels.items())))
+
+        if (histogram := self.histograms.get(key)) is None:
+            histogram = self.histograms[key] = Histogram()
+
+        histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Context manager recording the duration of its body in a histogram.
+
+        :param name: The name of the histogram.
+        :type name: str
+        :param labels: The labels of the histogram.
+        """
+        start = perf_counter()
+
+        try: yield
+        finally: self.observe(name, perf_counter() - start, **labels)
+
+    def add_collector(self, collector):
+        """
+        Registers a function returning gauges to include in the rendered metrics.
+
+        :param collector: Function returning an iterable of `(name, labels, value)` tuples.
+        :type collector: Callable[[], Iterable[tuple[str, dict, float]]]
+
+        :return: None
+        """
+        self.collectors.append(collector)
+
+    def remove_collector(self, collector):
+        """
+        Unregisters a collector added with `add_collector`.
+
+        :param collector: The collector to remove.
+        :type collector: Callable[[], Iterable[tuple[str, dict, float]]]
+
+        :return: None
+        """
+        if collector in self.collectors: self.collectors.remove(collector)
+
+    def counter(self, name, **labels):
+        """
+        Returns the current value of a counter, summed over every label set matching `labels`.
+
+        :param name: The name of the counter.
+        :type name: str
+        :param labels: The labels to match.
+
+        :return: The value of the counter.
+        :rtype: float
+        """
+        wanted = labels.items()
+
+        return sum(
+            value for (key, key_labels), value in self.counters.items()
+            if key == name and wanted <= dict(key_labels).items()
+        )
+
+    def render(self):
+        """
+        Renders every metric in the Prometheus text exposition format.
+
+        :return: The rendered metrics.
+        :rtype: str
+        """
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in sorted(self.counters.items()):
+            declare(name, 'counter')
+            lines.append(f'{name}{_labels(labels)} {value}')
+
+        for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            declare(name, 'histogram')
+            cumulative = 0
+
+            for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else bound
+                lines.append(f'{name}_bucket{_labels(labels + (("le", le),))} {cumulative}')
+
+            lines.append(f'{name}_sum{_labels(labels)} {histogram.sum}')
+            lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+
+        # A gauge family can be reported by several collectors (e.g. one per stream), and the
+        # format wants each family in one block under a single TYPE line.
+        gauges = {}
+
+        for collector in self.collectors:
+            try: samples = list(collector())
+            except Exception as e:
+                log_it(e, 2)
+                continue
+
+            for name, labels, value in samples:
+                gauges.setdefault(name, []).append(f'{name}{_labels(tuple(sorted(labels.items())))} {value}')
+
+        for name, samples in gauges.items():
+            declare(name, 'gauge')
+            lines.extend(samples)
+
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """
+        Builds a one-line summary of the giveaway counters and per-endpoint latencies.
+
+        :return: The summary line.
+        :rtype: str
+        """
+        joins = {}
+
+        for (name, labels), value in sorted(self.counters.items()):
+            if name == 'giveaway_joins_total':
+                result = dict(labels)['result']
+                joins[result] = joins.get(result, 0) + int(value)
+
+        parts = [f'joins {sum(joins.values())} (' + ', '.join(f'{count} {result}' for result, count in joins.items()) + ')']
+
+        if shed := int(self.counter('giveaway_joins_shed_total')): parts.append(f'shed {shed} joins')
+        if negative := int(self.counter('roblox_negative_hits_total')): parts.append(f'negative cache {negative} hits')
+
+        for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            if name == 'roblox_request_seconds':
+                endpoint = dict(labels)['endpoint']
+                errors = int(self.counter('roblox_errors_total', endpoint=endpoint))
+                parts.append(
+                    f'{endpoint} {histogram.count} req/{errors} err '
+                    f'avg {histogram.sum / histogram.count * 1000:.0f}ms p99 ≤{histogram.quantile(0.99) * 1000:.0f}ms'
+                )
+            elif name in ('payout_seconds', 'round_seconds'):
+                stream = f' {stream}' if (stream := dict(labels).get('stream')) else ''
+                parts.append(f'{name.split("_")[0]}s{stream} {histogram.count} avg {histogram.sum / histogram.count:.2f}s')
+
+        return 'Metrics: ' + ' | '.join(parts)
+
+
+def _labels(labels):
+    if not labels: return ''
+
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+metrics = MetricsRegistry()
+
+
+async def serve(registry=metrics, host='127.0.0.1', port=9100):
+    """
+    Starts a minimal HTTP server exposing the registry in the Prometheus text format on
+    `/metrics`.
+
+    :param registry: The registry to expose.
+    :type registry: MetricsRegistry
+    :param host: The interface to listen on.
+    :type host: str
+    :param port: The port to listen on.
+    :type port: int
+
+    :return: The running server; close it with `server.close()`.
+    :rtype: asyncio.Server
+    """
+    async def handle(reader, writer):
+        try:
+            request = await reader.readline()
+            while await reader.readline() not in (b'\r\n', b'\n', b''): pass
+
+            if request.split(b' ')[1:2] == [b'/metrics']:
+                status, body = '200 OK', registry.render().encode()
+            else: status, body = '404 Not Found', b'Not Found\n'
+
+            writer.write(
+                f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body
+            )
+            await writer.drain()
+        except Exception as e: log_it(e, 2)
+        finally: writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def report(registry=metrics, interval=60):
+    """
+    Logs the registry summary line every `interval` seconds, until cancelled.
+
+    :param registry: The registry to summarize.
+    :type registry: MetricsRegistry
+    :param interval: Time between two summaries, in seconds.
+    :type interval: float
+
+    :return: None
+    """
+    while True:
+        await asyncio.sleep(interval)
+        log_it(registry.summary())
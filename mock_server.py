@@ -0,0 +1,313 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from aiohttp import web
+from random import Random
+
+import argparse
+import asyncio
+import re
+
+
+class MockRoblox:
+    """
+    Local stand-in for the Roblox/roproxy endpoints used by the giveaway: users, games,
+    game-passes, economy product info, auth, the buying account's inventory and the game pass
+    revoke/purchase calls. All routes are served from a single host, so every `RobloxClient` host
+    and every `PurchaseClient` host can point at the same base URL.
+
+    The catalogue is generated from `seed`: users are named `User0`, `User1`, ... with user ID
+    `index + 1`, and each owns `games_per_user` games with `passes_per_game` passes priced
+    between 1 and `max_price` (or not for sale). Every request waits `latency` seconds plus up to
+    `jitter` seconds, and fails with a 500 (or a 429 with `Retry-After`) at `error_rate`.
+
+    :param users: Number of existing users.
+    :type users: int
+    :param games_per_user: Number of games owned by each user.
+    :type games_per_user: int
+    :param passes_per_game: Number of game passes in each game.
+    :type passes_per_game: int
+    :param max_price: Highest generated game pass price.
+    :type max_price: int
+    :param latency: Base latency of every request, in seconds.
+    :type latency: float
+    :param jitter: Maximum random latency added to every request, in seconds.
+    :type jitter: float
+    :param error_rate: Probability of a request failing, between 0 and 1.
+    :type error_rate: float
+    :param seed: Seed of the catalogue and of the latency and error draws.
+    :type seed: int
+    """
+
+    def __init__(self, users=1000, games_per_user=10, passes_per_game=5, max_price=20,
+                 latency=0.05, jitter=0.02, error_rate=0.0, seed=0):
+        self.users = users
+        self.games_per_user = games_per_user
+        self.passes_per_game = passes_per_game
+        self.max_price = max_price
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+
+        self.requests = {}
+        self.purchases = 0
+        self.owned = set()
+        self.csrf_token = 'mock-csrf-token'
+
+        self._random = Random(seed)
+        self._runner = None
+        self._passes = {}
+
+        self.routes = [
+            ('POST', re.compile(r'/v1/usernames/users'), self.usernames),
+            ('GET', re.compile(r'/v2/users/(?P<user_id>\d+)/games'), self.games),
+            ('GET', re.compile(r'/v1/games/(?P<game_id>\d+)/game-passes'), self.game_passes),
+            ('GET', re.compile(r'/v1/game-pass/(?P<gamepass_id>\d+)/game-pass-product-info'), self.product_info),
+            ('POST', re.compile(r'/v2/login'), self.login),
+            ('GET', re.compile(r'/v1/users/authenticated'), self.authenticated),
+            ('GET', re.compile(r'/v1/users/(?P<user_id>\d+)/items/GamePass/(?P<gamepass_id>\d+)'), self.inventory),
+            ('POST', re.compile(r'/game-passes/v1/game-passes/(?P<gamepass_id>\d+):revokeownership'), self.revoke),
+            ('POST', re.compile(r'/game-passes/v1/game-passes/(?P<product_id>\d+)/purchase'), self.purchase)
+        ]
+
+        self.app = web.Application()
+        self.app.router.add_route('*', '/{path:.*}', self._handle)
+
+    async def start(self, host='127.0.0.1', port=0):
+        """
+        Starts serving the mock.
+
+        :param host: The interface to listen on.
+        :type host: str
+        :param port: The port to listen on, 0 for a free one.
+        :type port: int
+
+        :return: The base URL of the running mock.
+        :rtype: str
+        """
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        port = site._server.sockets[0].getsockname()[1]
+        return f'http://{host}:{port}'
+
+    async def stop(self):
+        """
+        Stops serving the mock.
+
+        :return: None
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def dispatch(self, method, path, query=None, body=None, headers=None):
+        """
+        Answers a request without going through HTTP, applying the configured error rate but not
+        the latency. This is what the HTTP server uses too, and lets simulations drive the mock
+        in-process.
+
+        :param method: The HTTP method.
+        :type method: str
+        :param path: The path of the request.
+        :type path: str
+        :param query: The query parameters.
+        :type query: dict[str, str] | None
+        :param body: The decoded JSON body.
+        :type body: dict | None
+        :param headers: The request headers.
+        :type headers: dict[str, str] | None
+
+        :return: A tuple containing the status code, the JSON body and the response headers.
+        :rtype: tuple[int, dict, dict[str, str]]
+        """
+        for route_method, pattern, handler in self.routes:
+            if route_method == method and (match := pattern.fullmatch(path)):
+                self.requests[pattern.pattern] = self.requests.get(pattern.pattern, 0) + 1
+
+                if self._random.random() < self.error_rate:
+                    if self._random.random() < 0.5:
+                        return 429, {'errors': [{'message': 'Too many requests'}]}, {'Retry-After': '1'}
+                    return 500, {'errors': [{'message': 'InternalServerError'}]}, {}
+
+                request = {'query': query or {}, 'body': body or {}, 'headers': headers or {}, **match.groupdict()}
+                return handler(request)
+
+        return 404, {'errors': [{'message': 'NotFound'}]}, {}
+
+    async def _handle(self, request):
+        await asyncio.sleep(self.latency + self._random.random() * self.jitter)
+
+        body = await request.json() if request.can_read_body and request.content_type == 'application/json' else None
+        headers = {key.lower(): value for key, value in request.headers.items()}
+        status, data, response_headers = self.dispatch(request.method, request.path, dict(request.query), body, headers)
+
+        return web.json_response(data, status=status, headers=response_headers)
+
+    def _page(self, request, items):
+        limit = int(request['query'].get('limit', 10))
+        start = int(request['query'].get('cursor') or 0)
+        end = start + limit
+
+        return {
+            'previousPageCursor': str(max(start - limit, 0)) if start else None,
+            'nextPageCursor': str(end) if end < len(items) else None,
+            'data': items[start:end]
+        }
+
+    def _user_id(self, username):
+        name = username.lower()
+
+        if name.startswith('user') and name[4:].isdigit() and int(name[4:]) < self.users:
+            return int(name[4:]) + 1
+
+        return None
+
+    def _pass(self, game_id, index):
+        gamepass_id = game_id * 1000 + index
+        rng = Random(self.seed * 1_000_003 + gamepass_id)
+        price = rng.randint(1, self.max_price) if rng.random() < 0.8 else None
+
+        return {
+            'id': gamepass_id,
+            'name': f'Pass {gamepass_id}',
+            'displayName': f'Pass {gamepass_id}',
+            'productId': gamepass_id + 500_000_000,
+            'price': price,
+            'sellerName': f'User{game_id // 1000 - 1}',
+            'sellerId': game_id // 1000
+        }
+
+    def best_price(self, username, price_max):
+        """
+        Returns the price of the pass a lookup of `username` should settle on, straight from the
+        catalogue, to check resolved joins against.
+
+        :param username: The username of the creator.
+        :type username: str
+        :param price_max: The highest accepted game pass price.
+        :type price_max: int
+
+        :return: The highest price between 1 and `price_max` among the user's passes, `None` if
+            the user does not exist or has no such pass.
+        :rtype: int | None
+        """
+        if (user_id := self._user_id(username)) is None: return None
+
+        return max((
+            price
+            for index in range(self.games_per_user)
+            for gamepass in range(self.passes_per_game)
+            if (price := self._pass(user_id * 1000 + index, gamepass)['price']) is not None and 1 <= price <= price_max
+        ), default=None)
+
+    def usernames(self, request):
+        return 200, {'data': [
+            {'requestedUsername': username, 'hasVerifiedBadge': False, 'id': user_id, 'name': f'User{user_id - 1}', 'displayName': f'User{user_id - 1}'}
+            for username in request['body'].get('usernames', [])
+            if (user_id := self._user_id(username)) is not None
+        ]}, {}
+
+    def games(self, request):
+        user_id = int(request['user_id'])
+        if not 1 <= user_id <= self.users: return 400, {'errors': [{'message': 'The user is invalid or does not exist.'}]}, {}
+
+        games = [
+            {'id': user_id * 1000 + index, 'name': f'Game {index}', 'updated': f'2024-01-{index % 28 + 1:02d}T00:00:00Z'}
+            for index in range(self.games_per_user)
+        ]
+        if request['query'].get('sortOrder') == 'Desc': games.reverse()
+
+        return 200, self._page(request, games), {}
+
+    def game_passes(self, request):
+        game_id = int(request['game_id'])
+
+        if (passes := self._passes.get(game_id)) is None:
+            passes = self._passes[game_id] = [self._pass(game_id, index) for index in range(self.passes_per_game)]
+
+        return 200, self._page(request, passes), {}
+
+    def product_info(self, request):
+        gamepass_id = int(request['gamepass_id'])
+
+        return 200, {'TargetId': gamepass_id, 'ProductId': gamepass_id + 500_000_000, 'Name': f'Pass {gamepass_id}'}, {}
+
+    def _challenge(self, request):
+        if request['headers'].get('x-csrf-token') != self.csrf_token:
+            return 403, {'errors': [{'code': 0, 'message': 'Token Validation Failed'}]}, {'x-csrf-token': self.csrf_token}
+
+        return None
+
+    def login(self, request):
+        return self._challenge(request) or (200, {}, {})
+
+    def authenticated(self, request):
+        return 200, {'id': self.users + 1, 'name': 'Buyer', 'displayName': 'Buyer'}, {}
+
+    def inventory(self, request):
+        gamepass_id = int(request['gamepass_id'])
+        owned = int(request['user_id']) == self.users + 1 and gamepass_id in self.owned
+
+        return 200, {'data': [{'type': 'GamePass', 'id': gamepass_id, 'name': f'Pass {gamepass_id}'}] if owned else []}, {}
+
+    def revoke(self, request):
+        if challenge := self._challenge(request): return challenge
+
+        self.owned.discard(int(request['gamepass_id']))
+        return 200, {}, {}
+
+    def purchase(self, request):
+        if challenge := self._challenge(request): return challenge
+
+        self.purchases += 1
+        self.owned.add(int(request['product_id']) - 500_000_000)
+        return 200, {'purchased': True, 'reason': 'Success', 'productId': int(request['product_id'])}, {}
+
+
+async def _serve(args):
+    mock = MockRoblox(
+        users=args.users, games_per_user=args.games, passes_per_game=args.passes, max_price=args.max_price,
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed
+    )
+    print(f'Mock Roblox listening on {await mock.start(args.host, args.port)}')
+
+    try: await asyncio.Event().wait()
+    finally: await mock.stop()
+
+
+def add_arguments(parser):
+    """
+    Adds the mock configuration options to an argument parser.
+
+    :param parser: The parser to extend.
+    :type parser: argparse.ArgumentParser
+
+    :return: None
+    """
+    parser.add_argument('--users', type=int, default=1000, help='number of existing users')
+    parser.add_argument('--games', type=int, default=10, help='games per user')
+    parser.add_argument('--passes', type=int, default=5, help='game passes per game')
+    parser.add_argument('--max-price', type=int, default=20, help='highest game pass price')
+    parser.add_argument('--latency', type=float, default=0.05, help='base latency of every request, in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02, help='random latency added to every request, in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of a request failing')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the catalogue and of the random draws')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stand-in for the Roblox endpoints used by the giveaway.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    add_arguments(parser)
+
+    try: asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt: pass
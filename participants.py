@@ -0,0 +1,128 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from random import randrange
+
+
+class Participant:
+    """
+    Compact record of a user taking part in the giveaway.
+
+    :param username: The username the user joined with.
+    :type username: str
+    :param user_id: The Roblox user ID of the user.
+    :type user_id: int | None
+    :param gamepass: The game pass that is bought if the user wins, or `None` while unresolved.
+    :type gamepass: dict | None
+    """
+
+    __slots__ = ('username', 'user_id', 'gamepass')
+
+    def __init__(self, username, user_id=None, gamepass=None):
+        self.username = username
+        self.user_id = user_id
+        self.gamepass = gamepass
+
+    def __repr__(self):
+        return f'Participant({self.username!r}, user_id={self.user_id!r})'
+
+
+class ParticipantRegistry:
+    """
+    Set of participants keyed by username, with constant-time insert, lookup, removal and
+    random draw.
+
+    Records are kept in a dense list for drawing and indexed by username in a dict that maps
+    each username to the record's position. Removal swaps the record with the last one before
+    popping it, so the list never has holes and no operation has to scan or copy it.
+    """
+
+    def __init__(self):
+        self._records = []
+        self._index = {}
+
+    def __len__(self):
+        return len(self._records)
+
+    def __bool__(self):
+        return bool(self._records)
+
+    def __contains__(self, username):
+        return username in self._index
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def get(self, username):
+        """
+        Returns the record of the given username.
+
+        :param username: The username to look up.
+        :type username: str
+
+        :return: The record, or `None` if the username is not registered.
+        :rtype: Participant | None
+        """
+        position = self._index.get(username)
+        return None if position is None else self._records[position]
+
+    def add(self, participant):
+        """
+        Registers a participant, unless their username is already registered.
+
+        :param participant: The record to register.
+        :type participant: Participant
+
+        :return: `True` if the record was added, `False` if the username was already registered.
+        :rtype: bool
+        """
+        if participant.username in self._index: return False
+
+        self._index[participant.username] = len(self._records)
+        self._records.append(participant)
+
+        return True
+
+    def remove(self, username):
+        """
+        Removes the record of the given username.
+
+        :param username: The username to remove.
+        :type username: str
+
+        :return: The removed record, or `None` if the username is not registered.
+        :rtype: Participant | None
+        """
+        position = self._index.pop(username, None)
+        if position is None: return None
+
+        participant = self._records[position]
+        last = self._records.pop()
+
+        if last is not participant:
+            self._records[position] = last
+            self._index[last.username] = position
+
+        return participant
+
+    def draw(self):
+        """
+        Picks a uniformly random participant without removing them.
+
+        :return: The drawn record, or `None` if the registry is empty.
+        :rtype: Participant | None
+        """
+        return self._records[randrange(len(self._records))] if self._records else None
+
+    def clear(self):
+        """
+        Removes every record.
+
+        :return: None
+        """
+        self._records.clear()
+        self._index.clear()
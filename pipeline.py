@@ -0,0 +1,164 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from tracing import tracer
+from logger import log_it
+from clock import SYSTEM_CLOCK
+
+import asyncio
+
+
+OVERFLOW_POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+
+class JoinPipeline:
+    """
+    Producer/consumer pipeline decoupling chat ingestion from join resolution.
+
+    A producer task keeps calling `poll` and feeds every returned item into a bounded queue,
+    while a pool of worker tasks takes items off the queue and passes them to `handle`. Slow
+    lookups in `handle` therefore never stop the chat from being drained. A `handle` may also hand
+    the slow part off to a task of its own, as the giveaway does with join resolution, in which
+    case the workers and the queue no longer bound how much of it runs at once: `handle` has to.
+
+    When the queue is full the overflow policy decides what happens to a new item:
+
+    - `block`: the producer waits for room, so nothing is lost but polling pauses.
+    - `drop_newest`: the new item is dropped.
+    - `drop_oldest`: the oldest queued item is dropped to make room for the new one.
+
+    With `max_wait`, items that waited in the queue longer than that are skipped (and counted as
+    `expired`) instead of handled, which bounds how stale a handled item can be however far the
+    workers fall behind.
+
+    :param poll: Coroutine function returning the next batch of items.
+    :type poll: Callable[[], Awaitable[Iterable]]
+    :param handle: Coroutine function processing a single item.
+    :type handle: Callable[[Any], Awaitable[None]]
+    :param workers: Number of worker tasks consuming the queue.
+    :type workers: int
+    :param maxsize: Maximum number of items waiting in the queue.
+    :type maxsize: int
+    :param overflow: One of `OVERFLOW_POLICIES`.
+    :type overflow: str
+    :param max_wait: Longest time an item may wait in the queue, in seconds, `None` for no limit.
+    :type max_wait: float | None
+    :param clock: The clock the queue lag is measured with.
+    :type clock: SystemClock
+    """
+
+    def __init__(self, poll, handle, workers=8, maxsize=1000, overflow='block', max_wait=None, clock=SYSTEM_CLOCK):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy {overflow!r}, expected one of {OVERFLOW_POLICIES}')
+
+        self.poll = poll
+        self.handle = handle
+        self.workers = workers
+        self.overflow = overflow
+        self.max_wait = max_wait
+        self.clock = clock
+
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.expired = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+        self._queue = asyncio.Queue(maxsize)
+        self._tasks = []
+
+    async def start(self):
+        """
+        Starts the producer and worker tasks.
+
+        :return: None
+        """
+        if self._tasks: return
+
+        self._tasks.append(asyncio.create_task(self._produce()))
+        self._tasks.extend(asyncio.create_task(self._consume()) for _ in range(self.workers))
+
+    async def stop(self):
+        """
+        Cancels the producer and worker tasks and waits for them to finish.
+
+        :return: None
+        """
+        tasks, self._tasks = self._tasks, []
+
+        for task in tasks: task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        """
+        Returns the queue metrics. `lag` is how long the last dequeued item waited in the queue
+        and `max_lag` the longest wait seen so far, both in seconds.
+
+        :return: The queue depth and the enqueued, processed, dropped and expired counts along
+            with the lag metrics.
+        :rtype: dict[str, int | float]
+        """
+        return {
+            'depth': self._queue.qsize(),
+            'enqueued': self.enqueued,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'expired': self.expired,
+            'lag': self.lag,
+            'max_lag': self.max_lag
+        }
+
+    async def _put(self, item):
+        entry = (self.clock.monotonic(), item)
+
+        if self.overflow == 'block':
+            await self._queue.put(entry)
+
+        elif self._queue.full():
+            self.dropped += 1
+
+            if self.overflow == 'drop_newest': return
+
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self._queue.put_nowait(entry)
+
+        else: self._queue.put_nowait(entry)
+
+        self.enqueued += 1
+
+    async def _produce(self):
+        while True:
+            try:
+                for item in await self.poll():
+                    await self._put(item)
+            except asyncio.CancelledError: raise
+            except Exception as e:
+                log_it(e, 2)
+                await self.clock.sleep(1)
+
+    async def _consume(self):
+        while True:
+            enqueued, item = await self._queue.get()
+
+            now = self.clock.monotonic()
+            self.lag = now - enqueued
+            self.max_lag = max(self.max_lag, self.lag)
+            tracer.complete('queue.wait', enqueued, now, item=item)
+
+            if self.max_wait is not None and self.lag > self.max_wait:
+                self.expired += 1
+                self._queue.task_done()
+                continue
+
+            try: await self.handle(item)
+            except asyncio.CancelledError: raise
+            except Exception as e: log_it(e, 2)
+            finally:
+                self.processed += 1
+                self._queue.task_done()
@@ -0,0 +1,326 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from ratelimit import retry_after, backoff
+from json import dumps, loads
+from clock import SYSTEM_CLOCK
+from metrics import metrics
+from time import perf_counter
+
+import aiohttp
+
+
+class PurchaseClient:
+    """
+    Long-lived authenticated client for the game pass revoke and purchase calls.
+
+    A single keep-alive connection to `apis.roblox.com` is reused for every payout, so the
+    revoke and purchase requests of a payout travel back to back over the same socket. The CSRF
+    token Roblox requires on these calls is cached: it is only refreshed when a request is
+    rejected with a 403 token-validation challenge, which carries the new token in its
+    `x-csrf-token` header, and the rejected request is then sent again. A request throttled with
+    a 429 was not processed, so it is sent again too, after the `Retry-After` delay or a jittered
+    backoff; any other failure is returned as is, since retrying it could buy twice.
+
+    :param cookie: The `.ROBLOSECURITY` cookie of the buying account.
+    :type cookie: str
+    :param timeout: Total timeout of a single request, in seconds.
+    :type timeout: float
+    :param host: Base URL of the game pass API.
+    :type host: str
+    :param retries: How many times a throttled request is sent again.
+    :type retries: int
+    :param clock: The clock the retries are timed with.
+    :type clock: SystemClock
+    :param inventory_host: Base URL of the inventory API, used to check ownership.
+    :type inventory_host: str
+    :param users_host: Base URL of the users API, used to identify the buying account.
+    :type users_host: str
+    """
+
+    def __init__(self, cookie, timeout=10, host='https://apis.roblox.com', retries=3, clock=SYSTEM_CLOCK,
+                 inventory_host='https://inventory.roblox.com', users_host='https://users.roblox.com'):
+        self.cookie = cookie
+        self.host = host
+        self.inventory_host = inventory_host
+        self.users_host = users_host
+        self.user_id = None
+        self.retries = retries
+        self.clock = clock
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.csrf_token = None
+
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=1, keepalive_timeout=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                cookies={'.ROBLOSECURITY': self.cookie},
+                headers={'Origin': 'https://www.roblox.com'}
+            )
+
+        return self._session
+
+    async def close(self):
+        """
+        Closes the underlying session.
+
+        :return: None
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def post(self, path, headers, data=None, endpoint='purchase'):
+        """
+        Sends an authenticated POST request, answering a CSRF challenge by retrying once with the
+        refreshed token and retrying throttled requests.
+
+        :param path: Path of the endpoint, starting with a slash.
+        :type path: str
+        :param headers: Headers of the request; the CSRF token is added automatically.
+        :type headers: dict[str, str]
+        :param data: Optional body of the request.
+        :type data: str | None
+        :param endpoint: Name of the endpoint in the request metrics.
+        :type endpoint: str
+
+        :return: A tuple containing the status code and the decoded JSON body (an empty dict
+            if the body is empty).
+        :rtype: tuple[int, dict]
+        """
+        start = perf_counter()
+        status, result = None, {}
+
+        metrics.inc('roblox_requests_total', endpoint=endpoint)
+
+        try:
+            refreshed, attempt = False, 0
+
+            while True:
+                async with self._get_session().post(
+                    self.host + path,
+                    headers={**headers, 'x-csrf-token': self.csrf_token or ''},
+                    data=data
+                ) as response:
+                    status = response.status
+                    token = response.headers.get('x-csrf-token')
+
+                    if status == 403 and token and token != self.csrf_token and not refreshed:
+                        self.csrf_token, refreshed = token, True
+                        continue
+
+                    text = await response.text()
+
+                    if status != 429 or attempt == self.retries:
+                        result = loads(text) if text else {}
+                        break
+
+                    delay = max(retry_after(response.headers) or 0.0, backoff(attempt))
+
+                metrics.inc('roblox_retries_total', endpoint=endpoint)
+                attempt += 1
+                await self.clock.sleep(delay)
+        except Exception:
+            status = None
+            raise
+        finally:
+            if status != 200: metrics.inc('roblox_errors_total', endpoint=endpoint)
+            metrics.observe('roblox_request_seconds', perf_counter() - start, endpoint=endpoint)
+
+        return status, result
+
+    async def get(self, url, endpoint):
+        """
+        Sends an authenticated GET request to any Roblox host.
+
+        :param url: The full URL of the endpoint.
+        :type url: str
+        :param endpoint: Name of the endpoint in the request metrics.
+        :type endpoint: str
+
+        :return: A tuple containing the status code and the decoded JSON body (an empty dict
+            if the body is empty).
+        :rtype: tuple[int, dict]
+        """
+        start = perf_counter()
+        status = None
+
+        metrics.inc('roblox_requests_total', endpoint=endpoint)
+
+        try:
+            async with self._get_session().get(url) as response:
+                text = await response.text()
+                status = response.status
+
+            return status, loads(text) if text else {}
+        finally:
+            if status != 200: metrics.inc('roblox_errors_total', endpoint=endpoint)
+            metrics.observe('roblox_request_seconds', perf_counter() - start, endpoint=endpoint)
+
+    async def get_user_id(self):
+        """
+        Fetches the user ID of the buying account, once.
+
+        :raises RuntimeError: If the cookie is not accepted.
+
+        :return: The user ID of the authenticated account.
+        :rtype: int
+        """
+        if self.user_id is None:
+            status, result = await self.get(f'{self.users_host}/v1/users/authenticated', endpoint='authenticated')
+            if status != 200: raise RuntimeError(f'The cookie was not accepted (status {status})')
+
+            self.user_id = result['id']
+
+        return self.user_id
+
+    async def owns(self, gamepass):
+        """
+        Checks whether the buying account currently owns a game pass. This is what makes payouts
+        safe to retry: a pass owned right after being revoked was bought in the meantime.
+
+        :param gamepass: The game pass details, with its `id`.
+        :type gamepass: dict
+
+        :raises RuntimeError: If the inventory cannot be read.
+
+        :return: `True` if the account owns the game pass.
+        :rtype: bool
+        """
+        user_id = await self.get_user_id()
+        status, result = await self.get(
+            f'{self.inventory_host}/v1/users/{user_id}/items/GamePass/{gamepass["id"]}', endpoint='inventory'
+        )
+        if status != 200: raise RuntimeError(f'The inventory could not be read (status {status})')
+
+        return bool(result.get('data'))
+
+    async def revoke(self, gamepass):
+        """
+        Revokes the ownership of the given game pass from the buying account, so it can be bought
+        again.
+
+        :param gamepass: The game pass details, with its `id` and `name`.
+        :type gamepass: dict
+
+        :return: The status code of the revoke call.
+        :rtype: int
+        """
+        status, _ = await self.post(
+            f'/game-passes/v1/game-passes/{gamepass["id"]}:revokeownership',
+            headers={
+                'Referer': f'https://www.roblox.com/game-pass/{gamepass["id"]}/{gamepass["name"].strip()}',
+                'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8'
+            },
+            endpoint='revoke'
+        )
+
+        return status
+
+    async def purchase(self, gamepass, seller_id):
+        """
+        Buys the given game pass.
+
+        :param gamepass: The game pass details, with its `price` and `product_id`.
+        :type gamepass: dict
+        :param seller_id: The user ID of the game pass seller.
+        :type seller_id: int
+
+        :return: The decoded response of the purchase call; its `purchased` key tells whether
+            the purchase went through.
+        :rtype: dict
+        """
+        _, result = await self.post(
+            f'/game-passes/v1/game-passes/{gamepass["product_id"]}/purchase',
+            headers={
+                'Referer': 'https://www.roblox.com/',
+                'Content-Type': 'application/json; charset=UTF-8'
+            },
+            data=dumps({'expectedCurrency': 1, 'expectedPrice': gamepass['price'], 'expectedSellerId': seller_id})
+        )
+
+        return result
+
+    async def delete_buy(self, gamepass, seller_id):
+        """
+        Revokes the ownership of the given game pass from the buying account and purchases it
+        again, so the same pass can be bought on every win.
+
+        :param gamepass: The game pass details, with its `id`, `name`, `price` and `product_id`.
+        :type gamepass: dict
+        :param seller_id: The user ID of the game pass seller.
+        :type seller_id: int
+
+        :return: The decoded response of the purchase call; its `purchased` key tells whether
+            the purchase went through.
+        :rtype: dict
+        """
+        await self.revoke(gamepass)
+
+        return await self.purchase(gamepass, seller_id)
+
+
+class DryRunPurchaser:
+    """
+    Stand-in for `PurchaseClient` that never contacts Roblox: every payout succeeds immediately
+    and is only counted. Used by simulations and rehearsals.
+    """
+
+    def __init__(self):
+        self.purchases = 0
+        self.spent = 0
+
+        self._owned = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        pass
+
+    async def owns(self, gamepass):
+        return gamepass['id'] in self._owned
+
+    async def revoke(self, gamepass):
+        self._owned.discard(gamepass['id'])
+        return 200
+
+    async def purchase(self, gamepass, seller_id):
+        """
+        Pretends to buy the given game pass.
+
+        :param gamepass: The game pass details, with its `id`, `name`, `price` and `product_id`.
+        :type gamepass: dict
+        :param seller_id: The user ID of the game pass seller.
+        :type seller_id: int
+
+        :return: A successful purchase response, flagged with `dryRun`.
+        :rtype: dict
+        """
+        self.purchases += 1
+        self.spent += gamepass['price']
+        self._owned.add(gamepass['id'])
+
+        return {'purchased': True, 'reason': 'Success', 'productId': gamepass['product_id'], 'dryRun': True}
+
+    async def delete_buy(self, gamepass, seller_id):
+        await self.revoke(gamepass)
+
+        return await self.purchase(gamepass, seller_id)
@@ -0,0 +1,299 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from email.utils import parsedate_to_datetime
+from clock import SYSTEM_CLOCK
+from collections import deque
+from random import random
+from math import ceil
+
+import asyncio
+
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """
+    Paces requests to `rate` per second, letting up to `burst` of them through at once after a
+    quiet period. Waiters are served in arrival order: each `acquire()` reserves the next free
+    slot and sleeps until it comes.
+
+    :param rate: Sustained number of requests per second, `None` for no limit.
+    :type rate: float | None
+    :param burst: Number of requests allowed at once, `rate` rounded up by default.
+    :type burst: int | None
+    :param clock: The clock the slots are timed with.
+    :type clock: SystemClock
+    """
+
+    def __init__(self, rate, burst=None, clock=SYSTEM_CLOCK):
+        self.rate = rate
+        self.burst = burst or ceil(rate or 1)
+        self.clock = clock
+
+        self._interval = 1 / rate if rate else 0.0
+        self._tolerance = (self.burst - 1) * self._interval
+        self._next = 0.0
+
+    async def acquire(self):
+        """
+        Waits for the next free slot.
+
+        :return: None
+        """
+        now = self.clock.monotonic()
+        slot = max(self._next, now)
+        self._next = slot + self._interval
+
+        if (wait := slot - now - self._tolerance) > 0: await self.clock.sleep(wait)
+
+    def pause(self, delay):
+        """
+        Holds every slot back for `delay` seconds, e.g. after the host asked to retry later. After
+        the pause the requests resume one at a time, without a burst.
+
+        :param delay: How long to pause, in seconds.
+        :type delay: float
+
+        :return: None
+        """
+        self._next = max(self._next, self.clock.monotonic() + delay + self._tolerance)
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit adjusting itself with additive increase, multiplicative decrease: every
+    successful request grows it by about one per limit's worth of successes, and every throttled
+    request halves it, between `minimum` and `maximum`.
+
+    :param maximum: The initial and highest number of requests in flight.
+    :type maximum: int
+    :param minimum: The lowest number of requests in flight.
+    :type minimum: int
+    """
+
+    def __init__(self, maximum, minimum=1):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(maximum)
+        self.in_flight = 0
+
+        self._waiters = deque()
+
+    async def acquire(self):
+        """
+        Waits until fewer requests than the current limit are in flight and takes a slot.
+
+        :return: None
+        """
+        while self.in_flight >= int(self.limit):
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+
+            try: await future
+            except asyncio.CancelledError:
+                self._wake()
+                raise
+
+        self.in_flight += 1
+
+    def release(self):
+        """
+        Gives a slot back.
+
+        :return: None
+        """
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            if not (future := self._waiters.popleft()).done():
+                future.set_result(None)
+                break
+
+    def succeed(self):
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._wake()
+
+    def throttle(self):
+        self.limit = max(self.minimum, self.limit / 2)
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing host. After `threshold` consecutive failures the circuit opens and
+    `allow()` refuses every call for `reset_timeout` seconds; then a single probe call is let
+    through, which closes the circuit if it succeeds and opens it again if it fails. A probe that
+    never reports back (e.g. because it was cancelled) keeps the circuit open for one more timeout.
+
+    :param threshold: Consecutive failures opening the circuit.
+    :type threshold: int
+    :param reset_timeout: How long the circuit stays open, in seconds.
+    :type reset_timeout: float
+    :param clock: The clock the timeout is measured with.
+    :type clock: SystemClock
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30, clock=SYSTEM_CLOCK):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None: return 'closed'
+
+        return 'half_open' if self.retry_after() == 0 else 'open'
+
+    def retry_after(self):
+        """
+        Returns how long the circuit stays open.
+
+        :return: The remaining time, in seconds, 0 if calls may be attempted.
+        :rtype: float
+        """
+        if self.opened_at is None: return 0.0
+
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock.monotonic())
+
+    def allow(self):
+        """
+        Tells whether a call may be attempted now.
+
+        :return: `True` if the circuit is closed or this call is the probe of a half-open circuit.
+        :rtype: bool
+        """
+        if self.opened_at is None: return True
+        if self.retry_after() > 0: return False
+
+        self.opened_at = self.clock.monotonic()
+        return True
+
+    def succeed(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def fail(self):
+        self.failures += 1
+
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = self.clock.monotonic()
+
+
+class HostLimiter:
+    """
+    Everything guarding the calls to a single host: a `TokenBucket` pacing them, an
+    `AdaptiveLimit` capping how many are in flight and a `CircuitBreaker` failing them fast while
+    the host is down. Entering the limiter (`async with`) waits for a slot; the outcome of the call
+    is then reported with `record()`.
+
+    :param rate: Sustained number of requests per second, `None` for no limit.
+    :type rate: float | None
+    :param concurrency: Highest number of requests in flight.
+    :type concurrency: int
+    :param threshold: Consecutive failures opening the circuit.
+    :type threshold: int
+    :param reset_timeout: How long the circuit stays open, in seconds.
+    :type reset_timeout: float
+    :param clock: The clock the limiter is timed with.
+    :type clock: SystemClock
+    """
+
+    def __init__(self, rate=None, concurrency=16, threshold=5, reset_timeout=30, clock=SYSTEM_CLOCK):
+        self.bucket = TokenBucket(rate, clock=clock)
+        self.limit = AdaptiveLimit(concurrency)
+        self.breaker = CircuitBreaker(threshold, reset_timeout, clock=clock)
+
+    async def __aenter__(self):
+        await self.limit.acquire()
+
+        try: await self.bucket.acquire()
+        except BaseException:
+            self.limit.release()
+            raise
+
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.limit.release()
+
+    def record(self, status, headers=None):
+        """
+        Adjusts the limiter to the outcome of a call.
+
+        :param status: The status code of the response, `None` if the call failed without one.
+        :type status: int | None
+        :param headers: The headers of the response.
+        :type headers: Mapping[str, str] | None
+
+        :return: None
+        """
+        if status == 429:
+            self.limit.throttle()
+            self.bucket.pause(retry_after(headers) or 1.0)
+        elif status is None or status >= 500: self.breaker.fail()
+        else:
+            self.breaker.succeed()
+            self.limit.succeed()
+
+    def stats(self):
+        """
+        Returns the current state of the limiter.
+
+        :return: The concurrency limit, the requests in flight and whether the circuit is open.
+        :rtype: dict[str, float]
+        """
+        return {
+            'limit': int(self.limit.limit),
+            'in_flight': self.limit.in_flight,
+            'circuit_open': int(self.breaker.state == 'open')
+        }
+
+
+def retry_after(headers):
+    """
+    Reads the `Retry-After` header of a response, in either of its forms (a number of seconds or
+    an HTTP date).
+
+    :param headers: The headers of the response.
+    :type headers: Mapping[str, str] | None
+
+    :return: The delay requested by the host, in seconds, or `None` if there is none.
+    :rtype: float | None
+    """
+    if not headers or not (value := headers.get('Retry-After')): return None
+
+    try: return max(0.0, float(value))
+    except ValueError: pass
+
+    try:
+        date = parsedate_to_datetime(value)
+        return max(0.0, date.timestamp() - SYSTEM_CLOCK.time())
+    except (TypeError, ValueError): return None
+
+
+def backoff(attempt, base=0.5, cap=10.0):
+    """
+    Returns a retry delay with full jitter: a random duration up to an exponentially growing
+    bound, so clients retrying together spread out instead of hitting the host in waves.
+
+    :param attempt: The number of the retry, starting at 0.
+    :type attempt: int
+    :param base: The bound of the first retry, in seconds.
+    :type base: float
+    :param cap: The highest bound, in seconds.
+    :type cap: float
+
+    :return: The delay, in seconds.
+    :rtype: float
+    """
+    return random() * min(cap, base * 2 ** attempt)
@@ -0,0 +1,672 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from ratelimit import HostLimiter, RETRY_STATUSES, retry_after, backoff
+from clock import SYSTEM_CLOCK
+from metrics import metrics
+from tracing import tracer
+from logger import log_it
+from time import perf_counter
+from bisect import bisect_right
+from collections import deque
+from weakref import WeakValueDictionary
+from cache import TTLCache
+
+import aiohttp
+import asyncio
+
+
+HOSTS = {
+    'users': 'https://users.roproxy.com',
+    'games': 'https://games.roproxy.com',
+    'economy': 'https://economy.roproxy.com'
+}
+
+RATE_LIMITS = {
+    'users': 10,
+    'games': 50,
+    'economy': 50
+}
+
+CACHE_TTL = {
+    'users': 3600,
+    'games': 600,
+    'passes': 300,
+    'products': 3600,
+    'index': 300,
+    'negative': 120
+}
+
+NOT_FOUND = 'not_found'
+NO_GAMEPASS = 'no_gamepass'
+
+
+class RobloxError(Exception):
+    """
+    Raised when a Roblox (roproxy) endpoint answers with a non-200 status code.
+
+    :param status: The HTTP status code returned by the endpoint.
+    :type status: int
+    :param url: The URL that was requested.
+    :type url: str
+    """
+
+    def __init__(self, status, url):
+        super().__init__(f'{url} answered with status {status}')
+        self.status = status
+        self.url = url
+
+
+class CircuitOpenError(RobloxError):
+    """
+    Raised instead of sending a request while the circuit breaker of its host is open, i.e. the
+    host has been failing and is left alone for a while.
+
+    :param url: The URL that would have been requested.
+    :type url: str
+    :param retry_after: How long the circuit stays open, in seconds.
+    :type retry_after: float
+    """
+
+    def __init__(self, url, retry_after):
+        Exception.__init__(self, f'{url} is failing, requests are paused for {retry_after:.1f}s')
+        self.status = None
+        self.url = url
+        self.retry_after = retry_after
+
+
+class UsernameBatcher:
+    """
+    Coalesces concurrent username lookups into batched calls. The first lookup opens a short
+    window; every other username requested before it closes (or until `max_batch` usernames are
+    pending) is resolved by the same call, and each result is handed back to its waiting caller.
+    Concurrent lookups of the same username share one pending slot.
+
+    :param fetch: Coroutine function resolving a list of usernames to a dict mapping each
+        lowercased username to its user ID.
+    :type fetch: Callable[[list[str]], Awaitable[dict[str, int]]]
+    :param window: How long to wait for more usernames before sending a batch, in seconds.
+    :type window: float
+    :param max_batch: Maximum number of usernames sent in a single call.
+    :type max_batch: int
+    """
+
+    def __init__(self, fetch, window=0.05, max_batch=100):
+        self.fetch = fetch
+        self.window = window
+        self.max_batch = max_batch
+
+        self._pending = {}
+        self._timer = None
+        self._tasks = set()
+
+    async def resolve(self, username):
+        """
+        Queues a username for the next batch and waits for its user ID.
+
+        :param username: The username to resolve.
+        :type username: str
+
+        :return: The user ID, or `None` if the username was not found.
+        :rtype: int | None
+        """
+        key = username.lower()
+        future = self._pending.get(key)
+
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+
+            if len(self._pending) >= self.max_batch: self._flush()
+            elif self._timer is None: self._timer = loop.call_later(self.window, self._flush)
+
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, {}
+
+        task = asyncio.create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch):
+        try: user_ids = await self.fetch(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done(): future.set_exception(e)
+            return
+
+        for key, future in batch.items():
+            if not future.done(): future.set_result(user_ids.get(key))
+
+
+class PassIndex:
+    """
+    Price-sorted index of the game passes of a single user, so the best pass under any price cap
+    is a bisection. The index fills up as the user's games are scanned: `pending` holds the IDs
+    of the games not scanned yet and `scanning` those being fetched, and once both are empty the
+    index is `complete` and answers every cap on its own.
+
+    :param games: The IDs of the user's games, in the order they should be scanned.
+    :type games: Iterable[int]
+    """
+
+    __slots__ = ('prices', 'passes', 'pending', 'scanning', 'scanned')
+
+    def __init__(self, games):
+        self.prices = []
+        self.passes = []
+        self.pending = deque(games)
+        self.scanning = set()
+        self.scanned = set()
+
+    @property
+    def complete(self):
+        return not self.pending and not self.scanning
+
+    def add(self, game_id, gamepasses):
+        """
+        Adds the passes of a scanned game. Passes that are not for sale are left out.
+
+        :param game_id: The ID of the game.
+        :type game_id: int
+        :param gamepasses: The game passes of the game, as returned by `get_game_passes`.
+        :type gamepasses: list[dict]
+
+        :return: None
+        """
+        if game_id in self.scanned: return
+        self.scanned.add(game_id)
+
+        for gp in gamepasses:
+            if gp['price'] is None: continue
+
+            position = bisect_right(self.prices, gp['price'])
+            self.prices.insert(position, gp['price'])
+            self.passes.insert(position, gp)
+
+    def best(self, price_max):
+        """
+        Returns the most expensive indexed pass priced between 1 and `price_max`.
+
+        :param price_max: The highest accepted price, in Robux.
+        :type price_max: int
+
+        :return: The game pass, or `None` if no indexed pass qualifies.
+        :rtype: dict | None
+        """
+        position = bisect_right(self.prices, price_max)
+
+        if position and self.prices[position - 1] >= 1: return self.passes[position - 1]
+
+        return None
+
+    def settles(self, price_max):
+        """
+        Tells whether the index already knows the best pass under `price_max`: either every game
+        was scanned, or a pass priced exactly `price_max` was found, which nothing can beat.
+
+        :param price_max: The highest accepted price, in Robux.
+        :type price_max: int
+
+        :rtype: bool
+        """
+        return self.complete or ((best := self.best(price_max)) is not None and best['price'] == price_max)
+
+
+class RobloxClient:
+    """
+    Asynchronous client for the public Roblox lookups used by the giveaway (users, games and
+    economy). Every host gets its own pooled keep-alive session, so consecutive lookups reuse
+    already open connections instead of paying a new TCP/TLS handshake each time.
+
+    Every host also gets a `HostLimiter`: requests are paced by a token bucket (`RATE_LIMITS`
+    per second), the number in flight adapts to how the host copes (halving on a 429, growing
+    back slowly) up to `concurrency`, and after repeated failures a circuit breaker fails lookups
+    fast for a while. There is no cap across hosts, so up to `concurrency` requests can be in
+    flight on each of them at once.
+    Throttled and failed requests are retried with jittered backoff, waiting at least as long as
+    a `Retry-After` header asks.
+
+    Lookups are remembered in one bounded TTL/LRU cache per endpoint (`users` by username,
+    `games` by user ID, `passes` by game ID and `products` by game pass ID), so viewers who join
+    round after round resolve from memory. On top of them, `index` keeps a `PassIndex` per user,
+    so changing the price cap does not require refetching anything. Their counters are available
+    through `cache_stats()`.
+
+    Lookups that come back empty are remembered too, in the `negative` cache with its own short
+    TTL and a reason code: `NOT_FOUND` for usernames that do not exist (or belong to banned users,
+    which the API hides) and `NO_GAMEPASS` for users without a pass in the price range. Repeated
+    joins of such users are rejected without a single request; every such hit is counted in the
+    `roblox_negative_hits_total` metric by reason.
+
+    Usernames that miss the cache are resolved through a `UsernameBatcher`, so a burst of joins
+    costs a single call to the users endpoint instead of one per username.
+
+    The client must be created and used from a running event loop, and closed with `close()`
+    (or used as an async context manager) once the giveaway stops.
+
+    :param concurrency: Maximum number of requests in flight on each host.
+    :type concurrency: int
+    :param timeout: Total timeout of a single request, in seconds.
+    :type timeout: float
+    :param hosts: Optional overrides for the base URL of each host in `HOSTS`.
+    :type hosts: dict[str, str] | None
+    :param cache_size: Maximum number of entries kept by each endpoint cache.
+    :type cache_size: int
+    :param cache_ttl: Optional overrides for the lifetime, in seconds, of each cache in `CACHE_TTL`.
+    :type cache_ttl: dict[str, float] | None
+    :param batch_window: How long username lookups are collected before being sent, in seconds.
+    :type batch_window: float
+    :param rate_limits: Requests per second allowed on each host, overriding `RATE_LIMITS`.
+        `None` lifts the limit of a host.
+    :type rate_limits: dict[str, float | None] | None
+    :param retries: How many times a throttled or failed request is retried.
+    :type retries: int
+    :param scan_width: How many games of a user have their passes fetched at once.
+    :type scan_width: int
+    :param clock: The clock the cache lifetimes, rate limits and retries are timed with.
+    :type clock: SystemClock
+    """
+
+    def __init__(self, concurrency=16, timeout=10, hosts=None, cache_size=4096, cache_ttl=None, batch_window=0.05,
+                 rate_limits=None, retries=3, scan_width=4, clock=SYSTEM_CLOCK):
+        self.hosts = {**HOSTS, **(hosts or {})}
+        self.concurrency = concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.scan_width = scan_width
+        self.clock = clock
+        self.caches = {
+            name: TTLCache(maxsize=cache_size, ttl=ttl, clock=clock.monotonic)
+            for name, ttl in {**CACHE_TTL, **(cache_ttl or {})}.items()
+        }
+
+        self.limiters = {
+            name: HostLimiter(rate, concurrency=concurrency, clock=clock)
+            for name, rate in {**RATE_LIMITS, **(rate_limits or {})}.items()
+        }
+
+        self._sessions = {}
+        self._scans = WeakValueDictionary()
+        self._usernames = UsernameBatcher(self.get_user_ids, window=batch_window)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _session(self, host):
+        session = self._sessions.get(host)
+
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300, keepalive_timeout=60)
+            session = self._sessions[host] = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+        return session
+
+    async def close(self):
+        """
+        Closes every pooled session opened by the client.
+
+        :return: None
+        """
+        sessions, self._sessions = self._sessions, {}
+        await asyncio.gather(*(session.close() for session in sessions.values()))
+
+    def cache_stats(self):
+        """
+        Returns the counters of every endpoint cache.
+
+        :return: The size, hits, misses, evictions and expirations of each cache, by name.
+        :rtype: dict[str, dict[str, int]]
+        """
+        return {name: cache.stats() for name, cache in self.caches.items()}
+
+    def limiter_stats(self):
+        """
+        Returns the state of every host limiter.
+
+        :return: The concurrency limit, requests in flight and circuit state of each host, by name.
+        :rtype: dict[str, dict[str, int]]
+        """
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+    async def request(self, method, host, path, endpoint=None, **kwargs):
+        """
+        Sends a request to one of the configured hosts through its pooled session and returns
+        the decoded JSON body.
+
+        :param method: HTTP method, e.g. `GET` or `POST`.
+        :type method: str
+        :param host: Key of the host in `hosts` (`users`, `games` or `economy`).
+        :type host: str
+        :param path: Path of the endpoint, starting with a slash.
+        :type path: str
+        :param endpoint: Name of the endpoint in the request metrics, the host by default.
+        :type endpoint: str | None
+        :param kwargs: Extra keyword arguments forwarded to `aiohttp.ClientSession.request`.
+
+        :raises RobloxError: If the endpoint answers with a non-200 status code, after the retries
+            for throttled and failed requests are exhausted.
+        :raises CircuitOpenError: If the host has been failing and its circuit is open.
+
+        :return: The decoded JSON body.
+        :rtype: dict
+        """
+        url = self.hosts[host] + path
+        endpoint = endpoint or host
+        limiter = self.limiters[host]
+        start = perf_counter()
+
+        metrics.inc('roblox_requests_total', endpoint=endpoint)
+
+        with tracer.span(endpoint, 'http', method=method, path=path) as span:
+            try:
+                for attempt in range(self.retries + 1):
+                    if not limiter.breaker.allow(): raise CircuitOpenError(url, limiter.breaker.retry_after())
+
+                    status, data, headers = None, None, None
+                    span['attempts'] = attempt + 1
+
+                    async with limiter:
+                        try:
+                            with tracer.span('fetch', 'http', attempt=attempt) as fetch:
+                                status, data, headers = await self._fetch(host, method, url, **kwargs)
+                                fetch['status'] = status
+                        except (aiohttp.ClientError, asyncio.TimeoutError):
+                            self._record(host, None)
+                            if attempt == self.retries: raise
+                        else: self._record(host, status, headers)
+
+                    span['status'] = status
+                    if status == 200: return data
+                    if status is not None and (status not in RETRY_STATUSES or attempt == self.retries):
+                        raise RobloxError(status, url)
+
+                    metrics.inc('roblox_retries_total', endpoint=endpoint)
+                    await self.clock.sleep(max(retry_after(headers) or 0.0, backoff(attempt)))
+            except Exception:
+                metrics.inc('roblox_errors_total', endpoint=endpoint)
+                raise
+            finally: metrics.observe('roblox_request_seconds', perf_counter() - start, endpoint=endpoint)
+
+    def _record(self, host, status, headers=None):
+        # Logs the circuit of a host opening and closing once, rather than every lookup it fails.
+        breaker = self.limiters[host].breaker
+        was_open = breaker.opened_at is not None
+
+        self.limiters[host].record(status, headers)
+
+        if not was_open and breaker.opened_at is not None:
+            log_it(f'Roblox host {host} is failing, its requests are paused for {breaker.reset_timeout}s.', 2)
+        elif was_open and breaker.opened_at is None: log_it(f'Roblox host {host} recovered.')
+
+    async def _fetch(self, host, method, url, **kwargs):
+        async with self._session(host).request(method, url, **kwargs) as response:
+            if response.status != 200:
+                await response.read()
+                return response.status, None, response.headers
+
+            return response.status, await response.json(content_type=None), response.headers
+
+    async def get_user_ids(self, usernames):
+        """
+        Resolves a list of usernames to their user IDs in a single call, excluding banned users.
+
+        :param usernames: The usernames to resolve, at most 100.
+        :type usernames: list[str]
+
+        :return: The user IDs of the usernames that were found, keyed by lowercased username.
+        :rtype: dict[str, int]
+        """
+        data = await self.request(
+            'POST', 'users', '/v1/usernames/users',
+            json={'usernames': usernames, 'excludeBannedUsers': True}
+        )
+
+        return {user['requestedUsername'].lower(): user['id'] for user in data.get('data') or []}
+
+    async def get_user_id(self, username):
+        """
+        Resolves a username to its user ID, excluding banned users. Lookups that miss the cache
+        are batched with any other usernames requested at the same time.
+
+        :param username: The username to resolve.
+        :type username: str
+
+        :return: The user ID, or `None` if no such (unbanned) user exists.
+        :rtype: int | None
+        """
+        key = username.lower()
+        user_id = self.caches['users'].get(key)
+
+        if user_id is None:
+            if self._rejected(('user', key)): return None
+
+            user_id = await self._usernames.resolve(username)
+
+            if user_id is not None: self.caches['users'].set(key, user_id)
+            else: self.caches['negative'].set(('user', key), NOT_FOUND)
+
+        return user_id
+
+    def _rejected(self, key):
+        if (reason := self.caches['negative'].get(key)) is None: return None
+
+        metrics.inc('roblox_negative_hits_total', reason=reason)
+        return reason
+
+    async def _pages(self, host, path, endpoint, limit):
+        cursor = ''
+
+        while True:
+            data = await self.request(
+                'GET', host, path,
+                endpoint=endpoint, params={'limit': limit, 'sortOrder': 'Asc', 'cursor': cursor}
+            )
+            yield data.get('data', [])
+
+            if not (cursor := data.get('nextPageCursor')): break
+
+    async def get_games(self, user_id):
+        """
+        Fetches the IDs of the games created by a user, following the pages of the listing.
+
+        :param user_id: The ID of the creator.
+        :type user_id: int
+
+        :return: The IDs of the user's games, most recently updated first.
+        :rtype: list[int]
+        """
+        games = self.caches['games'].get(user_id)
+
+        if games is None:
+            listed = [
+                game
+                async for page in self._pages('games', f'/v2/users/{user_id}/games', 'games', 50)
+                for game in page if game.get('id')
+            ]
+            listed.sort(key=lambda game: game.get('updated') or '', reverse=True)
+
+            games = [game['id'] for game in listed]
+            self.caches['games'].set(user_id, games)
+
+        return games
+
+    async def get_game_passes(self, game_id):
+        """
+        Fetches the game passes of a single game, following the pages of the listing.
+
+        :param game_id: The ID of the game.
+        :type game_id: int
+
+        :return: The game passes, each with its `name`, `price`, `id` and `product_id`. The price
+            is `None` for passes that are not for sale, and the product ID is `None` when the
+            listing does not include it.
+        :rtype: list[dict]
+        """
+        gamepasses = self.caches['passes'].get(game_id)
+
+        if gamepasses is None:
+            gamepasses = [
+                {'name': gp.get('name', 'Unnamed Pass'), 'price': gp.get('price'), 'id': gp.get('id'), 'product_id': gp.get('productId')}
+                async for page in self._pages('games', f'/v1/games/{game_id}/game-passes', 'game-passes', 100)
+                for gp in page
+            ]
+            self.caches['passes'].set(game_id, gamepasses)
+
+            for gp in gamepasses:
+                if gp['product_id'] is not None: self.caches['products'].set(gp['id'], gp['product_id'])
+
+        return gamepasses
+
+    async def get_product_id(self, gamepass_id):
+        """
+        Fetches the product ID needed to purchase a game pass.
+
+        :param gamepass_id: The ID of the game pass.
+        :type gamepass_id: int
+
+        :return: The product ID of the game pass.
+        :rtype: int | None
+        """
+        product_id = self.caches['products'].get(gamepass_id)
+
+        if product_id is None:
+            data = await self.request('GET', 'economy', f'/v1/game-pass/{gamepass_id}/game-pass-product-info', endpoint='product-info')
+            product_id = data.get('ProductId')
+
+            if product_id is not None: self.caches['products'].set(gamepass_id, product_id)
+
+        return product_id
+
+    async def get_gamepass(self, username, price_max):
+        """
+        Fetches the most expensive game pass priced between 1 and `price_max` across all games of
+        the given user, together with the user's ID.
+
+        :param username: The username whose game pass and user ID are to be retrieved.
+        :type username: str
+        :param price_max: The highest accepted game pass price, in Robux.
+        :type price_max: int
+
+        :return: A tuple containing the game pass details and the user ID. The game pass
+            details include its name, price, ID, and associated product ID. The game pass is
+            `None` if no valid game pass is found, and both are `None` if the user is not found.
+        :rtype: tuple[dict | None, int | None]
+        """
+        try: user_id = await self.get_user_id(username)
+        except (RobloxError, aiohttp.ClientError, asyncio.TimeoutError): return None, None
+
+        if user_id is None: return None, None
+
+        return await self.get_best_gamepass(user_id, price_max), user_id
+
+    async def get_pass_index(self, user_id, price_max=None):
+        """
+        Returns the price-sorted index of a user's game passes, scanning as many of their games as
+        needed to settle `price_max` (see `PassIndex.settles`), or all of them if it is `None`.
+
+        Indexes are cached per user, so an index built for one cap serves any other cap (e.g.
+        tiered prizes) right away, or resumes the scan where it stopped. Games are scanned most
+        recently updated first, `scan_width` at a time. Games whose passes fail to load stay
+        pending and are tried again by the next call.
+
+        Only one scan of a user runs at a time: concurrent calls for the same user wait for it and
+        then pick up from the index it left, so they neither build the index twice nor see it
+        `complete` while another call still has games in flight.
+
+        :param user_id: The ID of the creator.
+        :type user_id: int
+        :param price_max: The price cap to settle, `None` to scan every game.
+        :type price_max: int | None
+
+        :return: The user's pass index.
+        :rtype: PassIndex
+        """
+        # Weakly held: the lock of a user goes away with the last call waiting on it.
+        if (lock := self._scans.get(user_id)) is None: lock = self._scans[user_id] = asyncio.Lock()
+
+        async with lock:
+            index = self.caches['index'].get(user_id)
+
+            if index is None:
+                index = PassIndex(await self.get_games(user_id))
+                self.caches['index'].set(user_id, index)
+
+            await self._scan(index, price_max)
+
+        return index
+
+    async def _scan(self, index, price_max):
+        scanning = {}
+        failed = []
+
+        def settled():
+            return price_max is not None and index.settles(price_max)
+
+        try:
+            while not settled():
+                while len(scanning) < self.scan_width and index.pending:
+                    game_id = index.pending.popleft()
+                    index.scanning.add(game_id)
+                    scanning[asyncio.ensure_future(self.get_game_passes(game_id))] = game_id
+
+                if not scanning: break
+
+                done, _ = await asyncio.wait(scanning, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    game_id = scanning.pop(task)
+                    index.scanning.discard(game_id)
+
+                    if task.exception() is not None: failed.append(game_id)
+                    else: index.add(game_id, task.result())
+        finally:
+            for task in scanning: task.cancel()
+            if scanning: await asyncio.gather(*scanning, return_exceptions=True)
+
+            index.scanning.difference_update(scanning.values())
+            index.pending.extendleft(reversed([*scanning.values(), *failed]))
+
+        return index
+
+    async def get_best_gamepass(self, user_id, price_max):
+        """
+        Fetches the most expensive game pass priced between 1 and `price_max` across all games of
+        an already resolved user, from their pass index (see `get_pass_index`). The scan stops as
+        soon as a pass priced exactly `price_max` turns up, since nothing can beat it. A user
+        found to have no valid pass is remembered in the negative cache, unless some of their
+        games could not be scanned.
+
+        :param user_id: The ID of the creator.
+        :type user_id: int
+        :param price_max: The highest accepted game pass price, in Robux.
+        :type price_max: int
+
+        :return: The game pass details (name, price, ID and product ID), or `None` if the user
+            has no valid game pass.
+        :rtype: dict | None
+        """
+        if self._rejected(('passes', user_id, price_max)): return None
+
+        index = await self.get_pass_index(user_id, price_max)
+
+        if (best := index.best(price_max)) is None:
+            if index.complete: self.caches['negative'].set(('passes', user_id, price_max), NO_GAMEPASS)
+            return None
+
+        gamepass = dict(best)
+        if gamepass['product_id'] is None: gamepass['product_id'] = await self.get_product_id(gamepass['id'])
+
+        return gamepass
@@ -0,0 +1,291 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from mock_server import MockRoblox, add_arguments
+from chat import ChatSource, ChatMessage, ReplayChatSource
+from urllib.parse import urlsplit, parse_qsl
+from time import perf_counter, process_time
+from journal import PayoutJournal, PayoutWorker
+from purchase import DryRunPurchaser
+from logger import configure, flush
+from clock import VirtualClock
+from roblox import RobloxClient, NOT_FOUND, NO_GAMEPASS
+from tracing import tracer, profiler
+from giveaway import Giveaway
+from metrics import metrics
+from winners import WinnersStore
+from random import Random
+from main import CONFIG
+from admission import InFlightLimit
+
+import tracemalloc
+import argparse
+import asyncio
+import json
+import sys
+
+
+class SimulatedRobloxClient(RobloxClient):
+    """
+    `RobloxClient` answering every lookup from an in-process `MockRoblox` instead of the network.
+    The mock's latency is spent on the client's clock, so on a `VirtualClock` it costs no real
+    time while still interleaving requests the way real latency would.
+
+    :param mock: The mock answering the requests.
+    :type mock: MockRoblox
+    :param kwargs: The `RobloxClient` options.
+    """
+
+    def __init__(self, mock, **kwargs):
+        super().__init__(**kwargs)
+        self.mock = mock
+
+    async def _fetch(self, host, method, url, params=None, json=None, **kwargs):
+        parts = urlsplit(url)
+        query = {**dict(parse_qsl(parts.query)), **{key: str(value) for key, value in (params or {}).items()}}
+
+        await self.clock.sleep(self.mock.latency + self.mock._random.random() * self.mock.jitter)
+        status, data, headers = self.mock.dispatch(method, parts.path, query, json)
+
+        return status, data if status == 200 else None, headers
+
+    async def close(self):
+        pass
+
+
+class SyntheticChatSource(ChatSource):
+    """
+    Chat source generating join commands on a clock: every second, about `rate` viewers drawn from
+    an audience of `audience` usernames (`User0`, `User1`, ...) send `<prefix><username>`, among
+    `chatter` other messages.
+
+    :param clock: The clock the chat is paced with.
+    :type clock: SystemClock
+    :param prefix: The join command prefix.
+    :type prefix: str
+    :param audience: Number of distinct viewers.
+    :type audience: int
+    :param rate: Average number of join commands per second.
+    :type rate: float
+    :param chatter: Average number of other messages per second.
+    :type chatter: float
+    :param seed: Seed of the generated messages.
+    :type seed: int
+    """
+
+    def __init__(self, clock, prefix='join', audience=1000, rate=0.5, chatter=5.0, seed=0):
+        self.clock = clock
+        self.prefix = prefix
+        self.audience = audience
+        self.rate = rate
+        self.chatter = chatter
+
+        self._random = Random(seed)
+        self._alive = True
+
+    def is_alive(self):
+        return self._alive
+
+    def _count(self, rate):
+        return int(rate) + (self._random.random() < rate % 1)
+
+    async def get(self):
+        await self.clock.sleep(1)
+
+        now = self.clock.time()
+        messages = [
+            ChatMessage(f'User{viewer}', f'{self.prefix} User{viewer}', now)
+            for viewer in (self._random.randrange(self.audience) for _ in range(self._count(self.rate)))
+        ]
+        messages.extend(ChatMessage('Viewer', 'hello', now) for _ in range(self._count(self.chatter)))
+
+        return messages
+
+    async def close(self):
+        self._alive = False
+
+
+def footprint(winners):
+    """
+    Estimates the memory held by the in-memory side of a winners store: its dict and every
+    username and win count or timestamps in it.
+
+    :param winners: The store to measure.
+    :type winners: WinnersStore
+
+    :return: The estimated size, in bytes.
+    :rtype: int
+    """
+    return sys.getsizeof(winners._wins) + sum(
+        sys.getsizeof(username) + sys.getsizeof(wins) + (sum(map(sys.getsizeof, wins)) if isinstance(wins, list) else 0)
+        for username, wins in winners._wins.items()
+    )
+
+
+async def simulate(args):
+    """
+    Runs giveaway rounds on a `VirtualClock` against an in-process mock, with dry-run purchases,
+    and prints what they cost: wall and CPU time, memory held by the winners, API calls made and,
+    with `--trace-memory`, the memory allocated by the whole process (which slows the run down
+    several times). With `--streams`, several giveaways run side by side on one shared client,
+    payout worker and winners store, their viewers drawn from the same audience.
+
+    :param args: The parsed command line arguments.
+    :type args: argparse.Namespace
+
+    :return: The simulation report.
+    :rtype: dict
+    """
+    configure(level=args.log_level)
+
+    config = {
+        **CONFIG, 'giveaway_threshold': args.threshold, 'price_max': args.price_max, 'lazy_resolve': args.lazy,
+        'max_in_flight': args.max_in_flight, 'round_cap': args.round_cap, 'shed_policy': args.shed_policy,
+        'join_cooldown': args.cooldown
+    }
+    clock = VirtualClock(start=0)
+    mock = MockRoblox(
+        users=args.users, games_per_user=args.games, passes_per_game=args.passes, max_price=args.max_price,
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed
+    )
+
+    client = SimulatedRobloxClient(
+        mock, concurrency=config['max_concurrency'], cache_size=config['cache_size'],
+        cache_ttl=config['cache_ttl'], batch_window=0, clock=clock
+    )
+    purchaser = DryRunPurchaser()
+    payouts = PayoutWorker(purchaser, PayoutJournal(args.journal, clock=clock), budget=args.budget, clock=clock)
+    chats = []
+
+    for stream in range(args.streams):
+        if args.replay: chats.append(ReplayChatSource(args.replay, speed=1.0, clock=clock))
+        else: chats.append(SyntheticChatSource(
+            clock, prefix=config['command_prefix'], audience=args.audience, rate=args.rate, seed=args.seed + stream
+        ))
+        await chats[-1].start()
+
+    winners = WinnersStore(args.winners_db, window=args.wins_window, clock=clock)
+    in_flight = InFlightLimit(config['max_in_flight'])
+    giveaways = [
+        Giveaway(
+            config, client, payouts, chat, winners=winners,
+            name=f'stream{stream}' if args.streams > 1 else None, in_flight=in_flight, clock=clock
+        )
+        for stream, chat in enumerate(chats)
+    ]
+    samples = []
+
+    async def sample():
+        while True:
+            samples.append((clock.time(), len(winners), footprint(winners)))
+            await clock.sleep(args.threshold)
+
+    if args.trace: tracer.configure(args.trace, clock=clock)
+    if args.profile: profiler.configure(args.profile)
+    if args.trace_memory: tracemalloc.start()
+    wall, cpu = perf_counter(), process_time()
+    sampler = asyncio.create_task(sample())
+
+    await payouts.start()
+
+    try: await asyncio.gather(*(giveaway.run(rounds=args.rounds) for giveaway in giveaways))
+    finally:
+        sampler.cancel()
+        await payouts.stop()
+        await asyncio.gather(*(chat.close() for chat in chats))
+        winners.close()
+        tracer.close()
+
+    wall, cpu = perf_counter() - wall, process_time() - cpu
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    samples.append((clock.time(), len(winners), footprint(winners)))
+
+    report = {
+        'rounds': args.rounds,
+        'streams': args.streams,
+        'virtual_seconds': clock.time(),
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        'memory_bytes': current if args.trace_memory else None,
+        'peak_memory_bytes': peak if args.trace_memory else None,
+        'winners': len(winners),
+        'winners_bytes': samples[-1][2],
+        'payouts': purchaser.purchases,
+        'robux_spent': purchaser.spent,
+        'requests': {
+            endpoint: int(metrics.counter('roblox_requests_total', endpoint=endpoint))
+            for endpoint in ('users', 'games', 'game-passes', 'product-info')
+        },
+        'errors': int(metrics.counter('roblox_errors_total')),
+        'shed': {
+            reason: sum(giveaway.admission.shed.get(reason, 0) for giveaway in giveaways)
+            for reason in ('cooldown', 'in_flight', 'round_full', 'reservoir')
+        },
+        'expired': sum(giveaway.pipeline.expired for giveaway in giveaways),
+        'max_queue_lag': max(giveaway.pipeline.max_lag for giveaway in giveaways),
+        'negative_hits': {
+            reason: int(metrics.counter('roblox_negative_hits_total', reason=reason))
+            for reason in (NOT_FOUND, NO_GAMEPASS)
+        },
+        'caches': client.cache_stats(),
+        'samples': samples
+    }
+
+    flush()
+    print(
+        f'{report["rounds"]} rounds on {report["streams"]} stream{"s" if report["streams"] > 1 else ""}, '
+        f'{report["virtual_seconds"] / 3600:.1f}h simulated in {wall:.2f}s ({cpu:.2f}s CPU)'
+    )
+    if args.trace_memory: print(f'Memory: {current / 1024:.0f} KiB allocated, {peak / 1024:.0f} KiB peak')
+    print(
+        f'Winners: {report["winners"]} kept in {report["winners_bytes"] / 1024:.0f} KiB, '
+        f'{report["payouts"]} payouts, {report["robux_spent"]} R$'
+    )
+    print('Requests: ' + ', '.join(f'{endpoint} {count}' for endpoint, count in report['requests'].items()) + f', {report["errors"]} errors')
+    print(
+        'Shed joins: ' + ', '.join(f'{reason} {count}' for reason, count in report['shed'].items()) +
+        f', {report["expired"]} expired, queue lag up to {report["max_queue_lag"]:.1f}s'
+    )
+    print('Negative cache hits: ' + ', '.join(f'{reason} {count}' for reason, count in report['negative_hits'].items()))
+
+    (_, first_winners, first_size), (_, last_winners, last_size) = samples[0], samples[-1]
+    if last_winners > first_winners:
+        print(f'Winners growth: {(last_size - first_size) / (last_winners - first_winners):.0f} bytes per new winner')
+
+    if args.json:
+        with open(args.json, 'w') as f: json.dump({'arguments': vars(args), 'report': report}, f, indent=4)
+
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs giveaway rounds on virtual time against the local Roblox mock, with dry-run purchases.')
+    add_arguments(parser)
+    parser.add_argument('--rounds', type=int, default=1000, help='number of rounds to run')
+    parser.add_argument('--threshold', type=float, default=CONFIG['giveaway_threshold'], help='collection window of a round, in seconds')
+    parser.add_argument('--price-max', type=int, default=CONFIG['price_max'], help='highest accepted game pass price')
+    parser.add_argument('--lazy', action='store_true', help='resolve game passes for the drawn winner only')
+    parser.add_argument('--max-in-flight', type=int, default=CONFIG['max_in_flight'], help='most join resolutions in flight, like max_in_flight')
+    parser.add_argument('--round-cap', type=int, default=CONFIG['round_cap'], help='most participants per round, like round_cap')
+    parser.add_argument('--shed-policy', default=CONFIG['shed_policy'], choices=('fcfs', 'reservoir'), help='which joins a full round keeps')
+    parser.add_argument('--cooldown', type=float, default=CONFIG['join_cooldown'], help='minimum time between two joins of a user, in seconds')
+    parser.add_argument('--streams', type=int, default=1, help='number of streams running side by side, sharing the client')
+    parser.add_argument('--budget', type=int, help='most Robux spent across the streams, like purchase_budget')
+    parser.add_argument('--audience', type=int, default=1100, help='number of distinct viewers sending join commands, beyond --users they do not exist')
+    parser.add_argument('--rate', type=float, default=0.5, help='join commands per second')
+    parser.add_argument('--replay', help='replay this chat capture instead of generating joins')
+    parser.add_argument('--winners-db', help='record the wins in this SQLite database, to measure the store')
+    parser.add_argument('--wins-window', type=float, help='count wins over this many seconds only, like max_wins_window')
+    parser.add_argument('--journal', help='journal the dry-run payouts to this file, to measure the journal')
+    parser.add_argument('--trace-memory', action='store_true', help='trace every allocation with tracemalloc')
+    parser.add_argument('--trace', help='record the spans of every join to this file (Chrome trace format), timed on the virtual clock')
+    parser.add_argument('--profile', nargs='?', const='profiles', help='profile every round into this directory')
+    parser.add_argument('--log-level', default='error', choices=('info', 'error'))
+    parser.add_argument('--json', help='write the report to this JSON file')
+
+    asyncio.run(simulate(parser.parse_args()))
@@ -0,0 +1,242 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from queue import SimpleQueue
+from contextlib import contextmanager
+from weakref import WeakKeyDictionary
+from clock import SYSTEM_CLOCK
+from logger import log_it
+
+import threading
+import cProfile
+import asyncio
+import pstats
+import json
+import os
+
+
+class Tracer:
+    """
+    Records trace spans in the Chrome trace event format, which chrome://tracing and Perfetto
+    (ui.perfetto.dev) open as a timeline.
+
+    Every asyncio task gets its own lane, named after the task, so the spans of a lane always nest
+    (e.g. a join worker's `join` span holding its `dedupe` and `admission` spans, and the task it
+    spawns showing the `resolve` span with the lookups and `admit`) while concurrent work like the
+    scan of a user's games shows side by side. Events are buffered and
+    written by a background thread, and until `configure()` is called every span is a no-op.
+
+    :param batch_size: Number of events buffered before they are handed to the writer.
+    :type batch_size: int
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.enabled = False
+        self.clock = SYSTEM_CLOCK
+
+        self._buffer = []
+        self._lanes = WeakKeyDictionary()
+        self._threads = {}
+        self._count = 0
+        self._queue = SimpleQueue()
+        self._writer = None
+        self._pid = os.getpid()
+
+    def configure(self, path, clock=SYSTEM_CLOCK):
+        """
+        Starts recording the spans to a trace file, replacing it if it exists.
+
+        :param path: The path of the trace file.
+        :type path: str
+        :param clock: The clock the spans are timed with.
+        :type clock: SystemClock
+
+        :return: None
+        """
+        self.close()
+
+        self.clock = clock
+        self._writer = threading.Thread(target=self._run, args=(path,), name='tracer', daemon=True)
+        self._writer.start()
+        self.enabled = True
+
+    def close(self):
+        """
+        Writes the buffered events and stops recording.
+
+        :return: None
+        """
+        if self._writer is None: return
+
+        self.enabled = False
+        self._queue.put(self._buffer)
+        self._queue.put(None)
+        self._writer.join(5.0)
+
+        self._buffer = []
+        self._lanes = WeakKeyDictionary()
+        self._threads = {}
+        self._writer = None
+
+    @contextmanager
+    def span(self, name, category='giveaway', **args):
+        """
+        Context manager recording its body as a span of the current lane.
+
+        :param name: The name of the span.
+        :type name: str
+        :param category: The category of the span, which trace viewers can filter on.
+        :type category: str
+        :param args: Details shown with the span.
+
+        :return: The details of the span, which the body can add to (e.g. a result).
+        :rtype: dict
+        """
+        if not self.enabled:
+            yield args
+            return
+
+        start = self.clock.monotonic()
+
+        try: yield args
+        finally:
+            end = self.clock.monotonic()
+            self._emit({
+                'name': name, 'cat': category, 'ph': 'X', 'pid': self._pid, 'tid': self._lane(),
+                'ts': start * 1e6, 'dur': (end - start) * 1e6, 'args': args
+            })
+
+    def complete(self, name, start, end, category='giveaway', **args):
+        """
+        Records a span that already happened, e.g. the time an item waited in a queue. Such spans
+        overlap whatever their lane did meanwhile, so each is shown on a track of its own.
+
+        :param name: The name of the span.
+        :type name: str
+        :param start: When the span started, on the tracer's clock `monotonic()`.
+        :type start: float
+        :param end: When the span ended, on the same clock.
+        :type end: float
+        :param category: The category of the span.
+        :type category: str
+        :param args: Details shown with the span.
+
+        :return: None
+        """
+        if not self.enabled: return
+
+        self._count += 1
+        event = {'name': name, 'cat': category, 'id': self._count, 'pid': self._pid, 'tid': self._lane()}
+
+        self._emit({**event, 'ph': 'b', 'ts': start * 1e6, 'args': args})
+        self._emit({**event, 'ph': 'e', 'ts': end * 1e6})
+
+    def _lane(self):
+        try: task = asyncio.current_task()
+        except RuntimeError: task = None
+
+        lanes, key = (self._lanes, task) if task is not None else (self._threads, threading.get_ident())
+
+        if (lane := lanes.get(key)) is None:
+            self._count += 1
+            lane = lanes[key] = self._count
+            label = task.get_name() if task is not None else threading.current_thread().name
+            self._emit({'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': lane, 'args': {'name': label}})
+
+        return lane
+
+    def _emit(self, event):
+        self._buffer.append(event)
+
+        if len(self._buffer) >= self.batch_size:
+            self._queue.put(self._buffer)
+            self._buffer = []
+
+    def _run(self, path):
+        # The closing bracket of the array is optional in the trace format, so a trace cut short
+        # by a crash still opens.
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('[\n')
+
+            while True:
+                batch = self._queue.get()
+                if batch is None: return
+
+                try:
+                    f.write(''.join(json.dumps(event, default=str) + ',\n' for event in batch))
+                    f.flush()
+                except Exception as e: log_it(e, 2)
+
+
+class RoundProfiler:
+    """
+    Captures a cProfile of every giveaway round once `configure()` is called, and dumps it to
+    `<directory>/<name>.prof` (for snakeviz, pstats, ...) along with `<name>.txt`, the `top`
+    functions by own time.
+
+    The profile covers everything the event loop ran during the round, including the payouts of
+    earlier rounds finishing in the background. Only one capture runs at a time, so with several
+    streams a round starting while another stream's is captured is not profiled.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.top = 30
+
+        self._active = False
+
+    def configure(self, directory, top=30):
+        """
+        Starts profiling the rounds.
+
+        :param directory: The directory the reports are written to, created if needed.
+        :type directory: str
+        :param top: Number of functions listed in the text reports.
+        :type top: int
+
+        :return: None
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.top = top
+
+    @contextmanager
+    def capture(self, name):
+        """
+        Context manager profiling its body, a no-op unless configured.
+
+        :param name: The name of the reports, e.g. `round-12`.
+        :type name: str
+        """
+        if self.directory is None or self._active:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        self._active = True
+        profile.enable()
+
+        try: yield
+        finally:
+            profile.disable()
+            self._active = False
+
+            try: self._dump(profile, name)
+            except Exception as e: log_it(e, 2)
+
+    def _dump(self, profile, name):
+        path = os.path.join(self.directory, name)
+        profile.dump_stats(path + '.prof')
+
+        with open(path + '.txt', 'w', encoding='utf-8') as f:
+            pstats.Stats(profile, stream=f).strip_dirs().sort_stats('tottime').print_stats(self.top)
+
+
+tracer = Tracer()
+profiler = RoundProfiler()
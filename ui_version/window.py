@@ -0,0 +1,315 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from PySide6.QtCore import Signal, QObject, Qt, QTimer
+from PySide6.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QPushButton,
+    QPlainTextEdit, QVBoxLayout, QLabel, QFormLayout,
+    QSpinBox, QLineEdit, QComboBox, QGroupBox,
+    QTabWidget, QHBoxLayout
+)
+from collections import deque
+from logger import log_it
+from engine import Engine
+from events import events
+from time import time
+
+import threading
+import asyncio
+import json
+import sys
+
+
+class EngineSignals(QObject):
+    event_signal = Signal(str, object)
+
+class LogBuffer:
+    """
+    Bounded history of the log lines, with one index per level so that a filtered view is
+    rebuilt without scanning the others. Once `capacity` lines are kept the oldest are dropped,
+    from the history and from their level's index alike.
+
+    Lines are also collected as pending until `take()` hands them over, so the view can append
+    them in batches instead of one at a time.
+
+    :param capacity: Maximum number of lines kept.
+    :type capacity: int
+    """
+
+    def __init__(self, capacity=5000):
+        self.capacity = capacity
+        self.records = deque()
+        self.levels = {1: deque(), 2: deque()}
+        self.pending = deque(maxlen=capacity)
+
+    def append(self, message, level):
+        record = (1 if level == 1 else 2, message)
+
+        if len(self.records) >= self.capacity:
+            oldest = self.records.popleft()
+            self.levels[oldest[0]].popleft()
+
+        self.records.append(record)
+        self.levels[record[0]].append(record)
+        self.pending.append(record)
+
+    def lines(self, level=None):
+        return [message for _, message in (self.records if level is None else self.levels[level])]
+
+    def take(self, level=None):
+        lines = [message for record_level, message in self.pending if level is None or record_level == level]
+        self.pending.clear()
+        return lines
+
+    def clear(self):
+        self.records.clear()
+        self.pending.clear()
+        for records in self.levels.values(): records.clear()
+
+LOG_FILTERS = (None, 1, 2)
+
+class GiveawayApp(QMainWindow):
+    def __init__(self, config, config_file):
+        super().__init__()
+        self.signals = EngineSignals()
+
+        self.setWindowTitle("Pls Donate Stream 1.0-UI @Pygot")
+        self.setMinimumSize(800, 600)
+
+        self.config = config
+        self.config_file = config_file
+
+        self.log_buffer = LogBuffer(self.config['log_capacity'])
+        self.setup_ui()
+        self.signals.event_signal.connect(self.on_event)
+        self.publish = self.signals.event_signal.emit
+        events.subscribe(self.publish)
+
+        self.log_timer = QTimer()
+        self.log_timer.timeout.connect(self.flush_logs)
+        self.log_timer.start(100)
+
+        self.is_running = False
+        self.giveaway_thread = None
+        self.engine = None
+        self.giveaway_end_time = 0
+
+        self.countdown_timer = QTimer()
+        self.countdown_timer.timeout.connect(self.update_countdown)
+        self.countdown_timer.start(1000)
+
+    def setup_ui(self):
+        main_widget = QWidget()
+        main_layout = QVBoxLayout(main_widget)
+        tabs = QTabWidget()
+        config_tab = QWidget()
+        logs_tab = QWidget()
+        config_layout = QVBoxLayout(config_tab)
+        youtube_group = QGroupBox("YouTube Configuration")
+        youtube_form = QFormLayout(youtube_group)
+        self.video_id_input = QLineEdit(self.config['video_id'])
+        youtube_form.addRow(QLabel("Video ID:"), self.video_id_input)
+        self.command_prefix_input = QLineEdit(self.config['command_prefix'])
+        youtube_form.addRow(QLabel("Command Prefix:"), self.command_prefix_input)
+        giveaway_group = QGroupBox("Giveaway Settings")
+        giveaway_form = QFormLayout(giveaway_group)
+        self.price_max_input = QSpinBox()
+        self.price_max_input.setRange(1, 1000)
+        self.price_max_input.setValue(self.config['price_max'])
+        giveaway_form.addRow(QLabel("Max Price (Robux):"), self.price_max_input)
+        self.giveaway_threshold_input = QSpinBox()
+        self.giveaway_threshold_input.setRange(10, 3600)
+        self.giveaway_threshold_input.setValue(self.config['giveaway_threshold'])
+        giveaway_form.addRow(QLabel("Giveaway Duration (seconds):"), self.giveaway_threshold_input)
+        self.max_wins_input = QSpinBox()
+        self.max_wins_input.setRange(1, 100)
+        self.max_wins_input.setValue(self.config['max_wins_per_user'])
+        giveaway_form.addRow(QLabel("Max Wins Per User:"), self.max_wins_input)
+        security_group = QGroupBox("Security Configuration")
+        security_form = QFormLayout(security_group)
+        self.cookie_input = QLineEdit(self.config['cookie'])
+        self.cookie_input.setEchoMode(QLineEdit.Password)
+        security_form.addRow(QLabel("Roblox Security Cookie:"), self.cookie_input)
+        config_layout.addWidget(youtube_group)
+        config_layout.addWidget(giveaway_group)
+        config_layout.addWidget(security_group)
+        buttons_layout = QHBoxLayout()
+        self.start_button = QPushButton("Start Giveaway")
+        self.start_button.clicked.connect(self.toggle_giveaway)
+        self.save_config_button = QPushButton("Save Configuration")
+        self.save_config_button.clicked.connect(self.save_configuration)
+        buttons_layout.addWidget(self.start_button)
+        buttons_layout.addWidget(self.save_config_button)
+        config_layout.addLayout(buttons_layout)
+        config_layout.addStretch()
+        logs_layout = QVBoxLayout(logs_tab)
+        self.log_level_combo = QComboBox()
+        self.log_level_combo.addItems(["All Logs", "Info Only", "Errors Only"])
+        self.log_level_combo.currentIndexChanged.connect(self.filter_logs)
+        log_controls = QHBoxLayout()
+        log_controls.addWidget(QLabel("Filter:"))
+        log_controls.addWidget(self.log_level_combo)
+        self.clear_logs_button = QPushButton("Clear Logs")
+        self.clear_logs_button.clicked.connect(self.clear_logs)
+        log_controls.addWidget(self.clear_logs_button)
+        log_controls.addStretch()
+        self.log_output = QPlainTextEdit()
+        self.log_output.setFocusPolicy(Qt.NoFocus)
+        self.log_output.setReadOnly(True)
+        self.log_output.setMaximumBlockCount(self.log_buffer.capacity)
+        logs_layout.addLayout(log_controls)
+        logs_layout.addWidget(self.log_output)
+        tabs.addTab(config_tab, "Configuration")
+        tabs.addTab(logs_tab, "Logs")
+        main_layout.addWidget(tabs)
+        self.setCentralWidget(main_widget)
+        self.statusBar().showMessage("Ready")
+        self.time_left_layout = QHBoxLayout()
+        self.time_left_label = QLabel("")
+        font = self.log_output.font()
+        font.setPointSize(20)
+        self.time_left_label.setFont(font)
+        self.time_left_label.setAlignment(Qt.AlignRight | Qt.AlignBottom)
+        self.time_left_layout.addWidget(self.time_left_label)
+        self.time_left_label.setScaledContents(True)
+        logs_layout.addLayout(self.time_left_layout)
+
+    def update_countdown(self):
+        if self.is_running:
+            current_time = time()
+            if self.giveaway_end_time > current_time:
+                remaining = self.giveaway_end_time - current_time
+                minutes = int(remaining // 60)
+                seconds = int(remaining % 60)
+                self.time_left_label.setText(f"Giveaway ends in: {minutes:02d}:{seconds:02d}")
+            else:
+                self.time_left_label.setText("Waiting for next giveaway...")
+        else:
+            self.time_left_label.setText("")
+
+    def on_event(self, kind, data):
+        match kind:
+            case 'log':
+                self.log_buffer.append(data['text'], data['level'])
+            case 'round_started':
+                self.giveaway_end_time = data['ends_at']
+            case 'winner':
+                self.statusBar().showMessage(f"Winner of giveaway #{data['number']}: {data['username']} ({data['price']}R$)")
+            case 'engine_stopped':
+                # A previous engine finishing its shutdown must not end the one running now.
+                if data.get('engine') is self.engine:
+                    self.on_giveaway_completed()
+
+    def flush_logs(self):
+        lines = self.log_buffer.take(LOG_FILTERS[self.log_level_combo.currentIndex()])
+        if not lines:
+            return
+        scrollbar = self.log_output.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        self.log_output.appendPlainText('\n'.join(lines))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def filter_logs(self):
+        self.log_buffer.pending.clear()
+        self.log_output.setPlainText('\n'.join(self.log_buffer.lines(LOG_FILTERS[self.log_level_combo.currentIndex()])))
+        scrollbar = self.log_output.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+
+    def clear_logs(self):
+        self.log_buffer.clear()
+        self.log_output.clear()
+        log_it("Logs cleared")
+
+    def save_configuration(self):
+        try:
+            self.update_config_from_ui()
+
+            with open(self.config_file, 'w') as f:
+                json.dump(self.config, f, indent=4)
+
+            log_it(f"Configuration saved to {self.config_file}")
+            self.statusBar().showMessage("Configuration saved", 3000)
+        except Exception as e:
+            log_it(f"Error saving configuration: {str(e)}", 2)
+            self.statusBar().showMessage("Error saving configuration", 3000)
+
+    def update_config_from_ui(self):
+        self.config['video_id'] = self.video_id_input.text()
+        self.config['command_prefix'] = self.command_prefix_input.text()
+        self.config['price_max'] = self.price_max_input.value()
+        self.config['giveaway_threshold'] = self.giveaway_threshold_input.value()
+        self.config['max_wins_per_user'] = self.max_wins_input.value()
+        self.config['cookie'] = self.cookie_input.text()
+
+    def toggle_giveaway(self):
+        self.start_button.setEnabled(False)
+        
+        if not self.is_running:
+            self.start_giveaway()
+        else:
+            self.stop_giveaway()
+            
+        # A stopping engine keeps the button disabled until its engine_stopped event arrives.
+        QTimer.singleShot(3000, lambda: self.start_button.setEnabled(self.is_running or self.engine is None))
+
+    def start_giveaway(self):
+        self.update_config_from_ui()
+        if not self.config['video_id']:
+            log_it("Video ID is required!", 2)
+            return
+        if not self.config['cookie']:
+            log_it("Roblox Security Cookie is required!", 2)
+            return
+        self.is_running = True
+        self.start_button.setText("Stop Giveaway")
+        self.statusBar().showMessage("Giveaway running")
+        log_it("Starting giveaway process...")
+        log_it(f"Configuration: Video ID: {self.config['video_id']}, Command: {self.config['command_prefix']}, "
+               f"Max Price: {self.config['price_max']}, Duration: {self.config['giveaway_threshold']}s")
+        self.engine = Engine(dict(self.config), self.config['cookie'])
+        self.giveaway_thread = threading.Thread(
+            target=self.run_giveaway_thread,
+            args=(self.engine,),
+            daemon=True
+        )
+        self.giveaway_thread.start()
+
+    def run_giveaway_thread(self, engine):
+        try:
+            asyncio.run(engine.run())
+        except Exception as e:
+            log_it(f"Error in giveaway thread: {str(e)}", 2)
+            self.publish('engine_stopped', {'engine': engine})
+
+    def on_giveaway_completed(self):
+        self.is_running = False
+        self.engine = None
+        self.start_button.setText("Start Giveaway")
+        self.start_button.setEnabled(True)
+        self.statusBar().showMessage("Giveaway completed")
+
+    def stop_giveaway(self):
+        self.is_running = False
+        self.start_button.setText("Stopping...")
+        self.statusBar().showMessage("Giveaway stopping...")
+        log_it("Stopping giveaway process...")
+        if self.engine:
+            self.engine.stop()
+
+    def closeEvent(self, event):
+        events.unsubscribe(self.publish)
+        if self.engine:
+            self.engine.stop()
+        super().closeEvent(event)
+
+
+def run_window(config, config_file):
+    app = QApplication(sys.argv)
+    window = GiveawayApp(config, config_file)
+    window.show()
+    return app.exec()
@@ -0,0 +1,230 @@
+"""
+╔════════════════════════════════════════════════════════════╗
+║  Author  : pygot                                           ║
+║  GitHub  : https://github.com/pygot                        ║
+╚════════════════════════════════════════════════════════════╝
+"""
+
+from queue import SimpleQueue, Empty
+from bisect import bisect_left
+from clock import SYSTEM_CLOCK
+from logger import log_it
+
+import threading
+import sqlite3
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS wins (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL COLLATE NOCASE,
+    user_id INTEGER,
+    gamepass_id INTEGER,
+    price INTEGER,
+    won_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS wins_username ON wins (username, won_at);
+CREATE INDEX IF NOT EXISTS wins_user_id ON wins (user_id, won_at);
+'''
+
+
+class WinnersStore:
+    """
+    Persistent record of the giveaway wins, enforcing `max_wins_per_user` across restarts.
+
+    The wins live in a SQLite database in WAL mode, indexed by username and by user ID. The
+    counts the eligibility checks need are kept in memory and loaded at startup, and new wins are
+    written behind by a background thread in batched transactions, so recording a win or checking
+    a join never waits on the disk.
+
+    With a `window`, only the wins of the last `window` seconds count (e.g. 86400 for "at most N
+    wins per 24h"): only those are loaded and kept in memory, and older ones are pruned from it as
+    time passes, so memory stays bounded over long streams.
+
+    :param path: The path of the database, `None` to keep the wins in memory only.
+    :type path: str | None
+    :param window: The period wins count for, in seconds, `None` for all time.
+    :type window: float | None
+    :param clock: The clock the wins are timestamped with.
+    :type clock: SystemClock
+    :param batch_size: Maximum number of wins written in a single transaction.
+    :type batch_size: int
+    """
+
+    def __init__(self, path=None, window=None, clock=SYSTEM_CLOCK, batch_size=256):
+        self.path = path
+        self.window = window
+        self.clock = clock
+        self.batch_size = batch_size
+
+        self._wins = {}
+        self._added = 0
+        self._queue = SimpleQueue()
+        self._writer = None
+        self._reader = None
+
+        if path is not None: self._load()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+
+        return connection
+
+    def _load(self):
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+
+        if self.window is None:
+            for username, count in connection.execute('SELECT lower(username), COUNT(*) FROM wins GROUP BY lower(username)'):
+                self._wins[username] = count
+        else:
+            rows = connection.execute(
+                'SELECT lower(username), won_at FROM wins WHERE won_at >= ? ORDER BY won_at',
+                (self.clock.time() - self.window,)
+            )
+            for username, won_at in rows: self._wins.setdefault(username, []).append(won_at)
+
+        connection.close()
+
+        self._writer = threading.Thread(target=self._run, name='winners', daemon=True)
+        self._writer.start()
+
+    def __len__(self):
+        return len(self._wins)
+
+    def __contains__(self, username):
+        return self.wins(username) > 0
+
+    def wins(self, username):
+        """
+        Returns how many times a user won, within the window if there is one.
+
+        :param username: The username of the user.
+        :type username: str
+
+        :return: The number of wins.
+        :rtype: int
+        """
+        key = username.lower()
+
+        if self.window is None: return self._wins.get(key, 0)
+        if (times := self._wins.get(key)) is None: return 0
+
+        self._expire(key, times)
+        return len(times)
+
+    def _expire(self, key, times):
+        del times[:bisect_left(times, self.clock.time() - self.window)]
+        if not times: self._wins.pop(key, None)
+
+    def add(self, username, user_id, gamepass=None):
+        """
+        Records a win. The count is updated at once; the row is written in the background.
+
+        :param username: The username of the winner.
+        :type username: str
+        :param user_id: The user ID of the winner.
+        :type user_id: int | None
+        :param gamepass: The game pass bought for the win, with its `id` and `price`.
+        :type gamepass: dict | None
+
+        :return: None
+        """
+        key, now = username.lower(), self.clock.time()
+
+        if self.window is None: self._wins[key] = self._wins.get(key, 0) + 1
+        else:
+            self._wins.setdefault(key, []).append(now)
+
+            self._added += 1
+            if self._added % 1000 == 0:
+                for name, times in list(self._wins.items()): self._expire(name, times)
+
+        if self._writer is not None:
+            self._queue.put((username, user_id, (gamepass or {}).get('id'), (gamepass or {}).get('price'), now))
+
+    def history(self, username=None, user_id=None, since=None):
+        """
+        Reads the recorded wins of a user from the database, by username or by user ID. Wins still
+        waiting to be written are not included.
+
+        :param username: The username of the user.
+        :type username: str | None
+        :param user_id: The user ID of the user.
+        :type user_id: int | None
+        :param since: Only return the wins after this time, in seconds since the epoch.
+        :type since: float | None
+
+        :return: The wins, oldest first, each with its `username`, `user_id`, `gamepass_id`,
+            `price` and `won_at`.
+        :rtype: list[dict]
+        """
+        if self.path is None: return []
+        if self._reader is None: self._reader = self._connect()
+
+        column, value = ('username', username) if username is not None else ('user_id', user_id)
+        rows = self._reader.execute(
+            f'SELECT username, user_id, gamepass_id, price, won_at FROM wins WHERE {column} = ? AND won_at >= ? ORDER BY won_at',
+            (value, since or 0)
+        )
+
+        return [dict(zip(('username', 'user_id', 'gamepass_id', 'price', 'won_at'), row)) for row in rows]
+
+    def flush(self, timeout=5.0):
+        """
+        Blocks until every win recorded so far has been written, or until `timeout` expires.
+
+        :param timeout: Maximum time to wait, in seconds.
+        :type timeout: float
+
+        :return: None
+        """
+        if self._writer is None: return
+
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        """
+        Writes the pending wins and closes the database.
+
+        :return: None
+        """
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join(5.0)
+            self._writer = None
+
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def _run(self):
+        connection = self._connect()
+
+        try:
+            while True:
+                batch = [self._queue.get()]
+
+                try:
+                    while len(batch) < self.batch_size: batch.append(self._queue.get_nowait())
+                except Empty: pass
+
+                rows = [item for item in batch if isinstance(item, tuple)]
+
+                if rows:
+                    try:
+                        with connection:
+                            connection.executemany(
+                                'INSERT INTO wins (username, user_id, gamepass_id, price, won_at) VALUES (?, ?, ?, ?, ?)', rows
+                            )
+                    except sqlite3.Error as e: log_it(e, 2)
+
+                for item in batch:
+                    if isinstance(item, threading.Event): item.set()
+
+                if None in batch: return
+        finally: connection.close()